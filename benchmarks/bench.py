@@ -0,0 +1,233 @@
+# Core benchmarks on synthetic decks, run from the repository root:
+#
+#   python -m benchmarks.bench                          # 1k, 10k and 100k cards, both backends
+#   python -m benchmarks.bench --sizes 1000000 --backend json
+#   python -m benchmarks.bench --save-baseline          # store this run as the new baseline
+#
+# Every run is compared against benchmarks/baseline.json: a metric that got more than
+# --tolerance worse than its stored value is flagged and the exit status is 1.
+# Times are the best of --repeat runs (signup_us: one pass over as many accounts as
+# cards); memory is the tracemalloc peak in MB. Baselines are only comparable on the
+# machine that saved them: re-save after changing hardware.
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from vibe_cards.analytics import DeckAnalytics
+from vibe_cards.auth import hash_password, verify_seconds
+from vibe_cards.card_index import CardIndex
+from vibe_cards.card_stats import new_stats, apply_review
+from vibe_cards.distractors import DistractorIndex
+from vibe_cards.grading import grade_batch
+from vibe_cards.sampler import MixedSampler
+from vibe_cards.search_index import CardSearchIndex
+from vibe_cards.storage import JsonStorage, SqliteStorage
+
+# --- Constants & Config ---
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = [1000, 10000, 100000]
+BACKENDS = ["json", "sqlite"]
+LIST_SIZE = 1000 # Cards per synthetic list
+SAMPLE_ANSWERS = 2000 # Answers graded and reviews recorded per run
+SAMPLE_QUERIES = 200
+TOLERANCE = 0.5 # Small timings on a shared machine easily wobble by a third
+NOISE_FLOOR = {"s": 0.01, "ms": 10.0, "us": 10.0, "mb": 1.0} # Differences below this are never a regression
+USERNAME = "bench"
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "bra", "che", "dri", "fla", "gno", "plu", "str"]
+
+
+# --- Synthetic Data ---
+def make_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def make_deck(n_cards, seed=0):
+    rng = random.Random(seed)
+    vocab = [make_word(rng) for _ in range(max(200, n_cards // 20))]
+    deck = {}
+    for card_id in range(1, n_cards + 1):
+        lst = deck.setdefault(f"List {(card_id - 1) // LIST_SIZE + 1:04d}", [])
+        card = {
+            "id": card_id,
+            "front": " ".join(rng.choices(vocab, k=rng.randint(1, 4))),
+            "back": " ".join(rng.choices(vocab, k=rng.randint(1, 3))),
+            "enable_write": rng.random() < 0.5,
+            "enable_choice": rng.random() < 0.3,
+            "distractors": rng.choices(vocab, k=3),
+            "stats": new_stats(),
+        }
+        for _ in range(rng.randint(0, 12)):
+            apply_review(card, rng.random() < 0.7, now=1.7e9 + card_id)
+        lst.append(card)
+    return deck
+
+def typo(rng, text):
+    if len(text) < 2 or rng.random() < 0.4:
+        return text
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+# --- Measurements ---
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def peak_mb(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20, result
+    finally:
+        tracemalloc.stop()
+
+def open_storage(backend, folder):
+    if backend == "sqlite":
+        return SqliteStorage(os.path.join(folder, "bench.db"))
+    return JsonStorage(folder)
+
+def run_size(backend, n_cards, repeat):
+    rng = random.Random(n_cards)
+    deck = make_deck(n_cards)
+    cards = [(name, pos, card) for name, lst in deck.items() for pos, card in enumerate(lst)]
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        storage = open_storage(backend, folder)
+
+        def save():
+            storage.save_deck(USERNAME, deck)
+            storage.compact(USERNAME, deck) # Waits for the queued JSON snapshot
+        results["save_s"] = best_of(repeat, save)
+
+        # Cold loads read every list, as the first full pass over a deck does
+        results["load_cold_s"] = best_of(repeat, lambda: open_storage(backend, folder).load_deck(USERNAME).load_all())
+        results["load_peak_mb"], _ = peak_mb(lambda: open_storage(backend, folder).load_deck(USERNAME).load_all())
+        # What the Library reads: the manifest and every list's summary, no cards
+        def library():
+            deck = open_storage(backend, folder).load_deck(USERNAME)
+            for name in deck:
+                deck.summary(name)
+        results["library_s"] = best_of(repeat, library)
+        # A Study Everything session up to its first card: the manifest plus one list
+        results["mixed_start_ms"] = best_of(
+            repeat, lambda: MixedSampler(open_storage(backend, folder).load_deck(USERNAME)).peek()
+        ) * 1e3
+        loaded = storage.load_deck(USERNAME).load_all()
+        results["load_warm_s"] = best_of(repeat, lambda: storage.load_deck(USERNAME))
+
+        pairs = [(typo(rng, card["back"]), card["back"]) for _, _, card in rng.choices(cards, k=SAMPLE_ANSWERS)]
+        results["grade_us"] = best_of(repeat, lambda: grade_batch(pairs)) / len(pairs) * 1e6
+
+        index = CardIndex(loaded)
+        sample = [card["id"] for _, _, card in rng.choices(cards, k=SAMPLE_ANSWERS)]
+        def review():
+            for card_id in sample:
+                list_name, pos = index.locate(card_id)
+                storage.record_review(USERNAME, loaded, list_name, pos, index.card(card_id), rng.random() < 0.7)
+        results["review_us"] = best_of(repeat, review) / len(sample) * 1e6
+        storage.compact(USERNAME, loaded) # Keep the snapshot write out of the next measurement
+
+        # As many accounts as cards; all share one hash, the KDF is timed on its own below
+        credential = hash_password("bench")
+        usernames = [f"user{i:07d}" for i in range(n_cards)]
+        start = time.perf_counter()
+        for username in usernames:
+            storage.add_user(username, credential)
+        results["signup_us"] = (time.perf_counter() - start) / n_cards * 1e6
+        lookups = rng.choices(usernames, k=SAMPLE_ANSWERS)
+        results["login_us"] = best_of(repeat, lambda: [storage.get_password(u) for u in lookups]) / len(lookups) * 1e6
+
+    results["search_build_s"] = best_of(repeat, lambda: CardSearchIndex.build(deck))
+    results["search_index_mb"], search = peak_mb(lambda: CardSearchIndex.build(deck))
+    queries = []
+    for _, _, card in rng.choices(cards, k=SAMPLE_QUERIES):
+        words = card["front"].split()
+        queries.append(" ".join(words[:-1] + [words[-1][:3]]))
+    results["search_us"] = best_of(repeat, lambda: [search.search(q) for q in queries]) / len(queries) * 1e6
+    results["analytics_build_s"] = best_of(repeat, lambda: DeckAnalytics.build(deck))
+
+    # One list's answer index, then options for uncached cards of that list
+    first_list = next(iter(deck.values()))
+    results["distractor_build_s"] = best_of(repeat, lambda: DistractorIndex.build(first_list))
+    distractor_index = DistractorIndex.build(first_list)
+    sample_cards = rng.choices(first_list, k=SAMPLE_QUERIES)
+    def options():
+        distractor_index.cached.clear()
+        for card in sample_cards:
+            distractor_index.distractors(card)
+    results["distractors_us"] = best_of(repeat, options) / len(sample_cards) * 1e6
+    results["verify_ms"] = verify_seconds(repeat=repeat) * 1e3 # Fixed cost of every login, at the configured iterations
+    return results
+
+
+# --- Baseline Comparison ---
+def metric_unit(metric):
+    return metric.rsplit("_", 1)[1]
+
+def is_regression(metric, value, base, tolerance):
+    return value > base * (1 + tolerance) and value - base > NOISE_FLOOR[metric_unit(metric)]
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f).get("results", {})
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "saved_at": time.strftime("%Y-%m-%d"),
+            "results": results,
+        }, f, indent=2)
+        f.write("\n")
+
+def report(backend, n_cards, results, baseline, tolerance):
+    base = baseline.get(backend, {}).get(str(n_cards), {})
+    regressions = []
+    print(f"\n{backend}, {n_cards:,} cards")
+    for metric, value in results.items():
+        line = f"  {metric:<16} {value:12.4f}"
+        if metric in base:
+            flag = is_regression(metric, value, base[metric], tolerance)
+            line += f"   baseline {base[metric]:12.4f}  {value / base[metric] if base[metric] else 0:5.2f}x"
+            if flag:
+                line += "  REGRESSION"
+                regressions.append(f"{backend}/{n_cards}/{metric}")
+        print(line)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench", description="Benchmark the vibe_cards core")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Merge this run into the baseline file")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    regressions = []
+    for backend in args.backend:
+        for n_cards in args.sizes:
+            results = run_size(backend, n_cards, args.repeat)
+            regressions += report(backend, n_cards, results, baseline, args.tolerance)
+            baseline.setdefault(backend, {})[str(n_cards)] = results
+
+    if args.save_baseline:
+        save_baseline(args.baseline, baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
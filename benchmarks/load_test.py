@@ -0,0 +1,174 @@
+# Load test of the review sync service, run from the repository root:
+#
+#   python -m benchmarks.load_test                       # spawns a local instance on a temporary data folder
+#   python -m benchmarks.load_test --backend sqlite --clients 20 --batch 500
+#   python -m benchmarks.load_test --url http://127.0.0.1:8765 --username alice --password ...  # changes alice's stats!
+#
+# Each client logs in, then alternates POST /reviews batches of random answers with
+# GET /due, over one keep-alive connection. Reports answers/s and latency percentiles.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.bench import make_deck
+from vibe_cards.auth import hash_password
+from vibe_cards.storage import JsonStorage, SqliteStorage
+
+# --- Constants & Config ---
+USERS = 4 # Synthetic users when spawning; clients are spread over them
+CARDS_PER_USER = 10000
+PASSWORD = "load-test"
+STARTUP_TIMEOUT = 30
+
+
+# --- Minimal HTTP/1.1 Client (one keep-alive connection) ---
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+        self.token = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            headers += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(headers.encode("latin-1") + b"\r\n" + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length)) if length else {}
+        if status != 200:
+            raise RuntimeError(f"{method} {path}: {status} {data}")
+        return data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# --- Clients ---
+async def client(url, username, password, card_ids, duration, batch, latencies, seed):
+    rng = random.Random(seed)
+    conn = Connection(url.hostname, url.port)
+    try:
+        conn.token = (await conn.request("POST", "/login", {"username": username, "password": password}))["token"]
+        if card_ids is None:
+            # An existing account: answer among the cards due in the next 100 years
+            cards = (await conn.request("GET", "/due?limit=1000&within=3e9"))["cards"]
+            card_ids = [card["id"] for card in cards]
+        answered = 0
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            now = time.time()
+            reviews = [
+                {"id": rng.choice(card_ids), "ok": rng.random() < 0.7, "ts": now - rng.random() * 3600}
+                for _ in range(batch)
+            ]
+            start = time.perf_counter()
+            result = await conn.request("POST", "/reviews", {"reviews": reviews})
+            latencies["reviews"].append(time.perf_counter() - start)
+            answered += result["applied"]
+            start = time.perf_counter()
+            await conn.request("GET", "/due?limit=50")
+            latencies["due"].append(time.perf_counter() - start)
+        return answered
+    finally:
+        conn.close()
+
+async def run_clients(url, accounts, clients, duration, batch):
+    latencies = {"reviews": [], "due": []}
+    start = time.perf_counter()
+    answered = await asyncio.gather(*(
+        client(url, *accounts[i % len(accounts)], duration, batch, latencies, seed=i) for i in range(clients)
+    ))
+    return sum(answered), time.perf_counter() - start, latencies
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+# --- Local Instance ---
+def spawn_server(folder, backend, port):
+    # Synthetic users with fixed decks, then the service as a child process in `folder`
+    data_folder = os.path.join(folder, "user_data")
+    storage = SqliteStorage(os.path.join(data_folder, "vibe_cards.db")) if backend == "sqlite" else JsonStorage(data_folder)
+    credential = hash_password(PASSWORD)
+    accounts = []
+    for i in range(USERS):
+        username = f"load{i}"
+        storage.add_user(username, credential)
+        deck = make_deck(CARDS_PER_USER, seed=i)
+        storage.save_deck(username, deck)
+        storage.compact(username, deck)
+        accounts.append((username, PASSWORD, [card["id"] for lst in deck.values() for card in lst]))
+    env = dict(os.environ, VIBE_CARDS_STORAGE=backend, PYTHONPATH=os.getcwd())
+    process = subprocess.Popen(
+        [sys.executable, "-m", "vibe_cards.server", "--port", str(port)], cwd=folder, env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + STARTUP_TIMEOUT
+    while True:
+        try:
+            asyncio.run(Connection("127.0.0.1", port).request("GET", "/health"))
+            return process, accounts
+        except OSError:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("sync service didn't start")
+            time.sleep(0.1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test", description="Load test the review sync service")
+    parser.add_argument("--url", help="A running instance (default: spawn one on a temporary data folder)")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=200, help="Answers per POST /reviews")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as folder:
+        if args.url:
+            if not (args.username and args.password):
+                parser.error("--url needs --username and --password")
+            url = urlsplit(args.url)
+            accounts = [(args.username, args.password, None)]
+        else:
+            url = urlsplit(f"http://127.0.0.1:{args.port}")
+            process, accounts = spawn_server(folder, args.backend, args.port)
+        try:
+            answered, elapsed, latencies = asyncio.run(run_clients(url, accounts, args.clients, args.duration, args.batch))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print(f"{args.clients} clients x batches of {args.batch} for {elapsed:.1f} s ({args.backend if process else args.url})")
+    print(f"  answers applied   {answered:,} ({answered / elapsed:,.0f}/s)")
+    for name, values in latencies.items():
+        print(
+            f"  {name:<8} {len(values):6} requests   p50 {percentile(values, 0.5) * 1e3:7.1f} ms"
+            f"   p95 {percentile(values, 0.95) * 1e3:7.1f} ms   p99 {percentile(values, 0.99) * 1e3:7.1f} ms"
+        )
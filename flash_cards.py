@@ -1,85 +1,105 @@
 import streamlit as st
-import json
-import os
 import random
-import difflib
-import csv
-import io
+import time
+from collections import deque
+from functools import partial
+from vibe_cards import trace
+from vibe_cards.storage import get_storage
+from vibe_cards.auth import hash_password, verify_password, needs_rehash
+from vibe_cards.card_stats import new_stats, recent_accuracy
+from vibe_cards.card_list import CARD_SORTS, matching_cards, page_of_cards
+from vibe_cards.scheduler import DueQueue
+from vibe_cards.sampler import MixedSampler
+from vibe_cards.grading import grade_answer
+from vibe_cards.importer import import_cards, detect_format, open_upload
+from vibe_cards.exporter import FORMATS as EXPORT_EXTENSIONS, export_deck
+from vibe_cards.search_index import get_search_index
+from vibe_cards.card_index import get_card_index
+from vibe_cards.analytics import HARDEST_LIMIT, get_analytics
+from vibe_cards.registry import drop_indexes
+from vibe_cards.sync import record_answers
+from vibe_cards.distractors import choice_options, get_distractor_index
 
 # --- Constants & Config ---
-DATA_FOLDER = "user_data"
-USERS_FILE = os.path.join(DATA_FOLDER, "users.json")
+SPACED_ORDER = "Due First (Spaced Repetition)"
+MIXED_ORDER = "Mixed (Weighted by Misses)" # Every list at once; the only order of a "Study Everything" session
+PAGE_SIZES = [10, 25, 50, 100]
+CARD_SEARCH_RESULTS = 20
+EXPORT_FORMATS = {"CSV": "csv", "JSONL": "jsonl", "Zip (with review history)": "zip"}
 
 st.set_page_config(page_title="Vibe Cards", page_icon="⚡", layout="wide")
 
+# --- Instrumentation (opt-in: VIBE_CARDS_TRACE=1, optionally VIBE_CARDS_TRACE_FILE=trace.jsonl) ---
+if trace.ENABLED:
+    if "trace_reruns" not in st.session_state:
+        st.session_state.trace_reruns = deque(maxlen=trace.KEEP_RERUNS)
+    trace.begin_rerun(st.session_state.trace_reruns, user=st.session_state.get("username", ""))
+
 # --- Helper Functions ---
-def ensure_data_folder():
-    if not os.path.exists(DATA_FOLDER):
-        os.makedirs(DATA_FOLDER)
+# Logic lives in the vibe_cards package; pick the storage backend with VIBE_CARDS_STORAGE=json|sqlite
+def check_login(username, password):
+    # One keyed lookup plus one hash check, however many accounts exist
+    stored = get_storage().get_password(username)
+    if not verify_password(stored, password):
+        return False
+    if needs_rehash(stored):
+        get_storage().set_password(username, hash_password(password)) # Plain or weaker hash from an older version
+    return True
 
-def load_users():
-    ensure_data_folder()
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "r") as f:
-            return json.load(f)
-    return {}
+def add_user(username, password):
+    return get_storage().add_user(username, hash_password(password))
 
-def save_users(users):
-    ensure_data_folder()
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f)
+def load_deck(username):
+    return get_storage().load_deck(username)
 
-def get_user_deck_file(username):
-    ensure_data_folder()
-    return os.path.join(DATA_FOLDER, f"{username}_deck.json")
+def refresh_deck():
+    # Picks up what other processes (the sync server, another app instance) wrote since
+    # the deck was loaded; the same deck object while nothing did
+    deck = get_storage().refresh_deck(st.session_state.username, st.session_state.deck_data)
+    if deck is not st.session_state.deck_data:
+        st.session_state.deck_data = deck
+        if st.session_state.mixed_sampler is not None:
+            st.session_state.mixed_sampler.deck_data = deck
 
-def load_deck(username):
-    deck_path = get_user_deck_file(username)
-    if os.path.exists(deck_path):
-        with open(deck_path, "r") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                deck_dict = {"Default": data}
-            else:
-                deck_dict = data
-            
-            # Ensure stats exist
-            for lst in deck_dict.values():
-                for card in lst:
-                    if "stats" not in card:
-                        card["stats"] = {"attempts": 0, "history": []}
-            return deck_dict
-            
-    return {
-        "Default": [
-            {
-                "id": 1, 
-                "front": f"Welcome {username}!", 
-                "back": "This is your private deck.", 
-                "enable_write": False, 
-                "enable_choice": False, 
-                "distractors": [],
-                "stats": {"attempts": 0, "history": []}
-            }
-        ]
-    }
+def save_deck(username, deck_data, lists=None):
+    # `lists`: the lists whose cards changed; only those files/rows are rewritten
+    get_storage().save_deck(username, deck_data, lists)
 
-def save_deck(username, deck_data):
-    deck_path = get_user_deck_file(username)
-    with open(deck_path, "w") as f:
-        json.dump(deck_data, f)
+def card_index():
+    # id -> (list, position) for the logged-in user's deck, built once per loaded deck.
+    # Cards are added, deleted and edited through it so the search index, analytics
+    # and distractor indexes follow.
+    return get_card_index(st.session_state.username, st.session_state.deck_data)
+
+def update_card_stats(card_id, is_correct):
+    # Same path as a batch from the sync service, with a batch of one
+    record_answers(st.session_state.username, st.session_state.deck_data, [(card_id, is_correct, None)])
+
+def advance_session(card):
+    st.session_state.is_flipped = False
+    if st.session_state.session_settings["order"] == SPACED_ORDER:
+        st.session_state.due_queue.advance(card)
+    elif st.session_state.session_settings["order"] == MIXED_ORDER:
+        st.session_state.mixed_sampler.advance()
+    else:
+        st.session_state.current_index = (st.session_state.current_index + 1) % len(st.session_state.study_indices)
 
-def check_similarity(user_input, correct_answer):
-    return difflib.SequenceMatcher(None, user_input.lower().strip(), correct_answer.lower().strip()).ratio()
+def jump_to_card(list_name, card):
+    # Search hit -> straight into a review session of its list, starting at that card
+    deck = st.session_state.deck_data[list_name]
+    st.session_state.selected_list_name = list_name
+    st.session_state.session_settings = {"order": "Sequential", "mode": "Flip Only (Review)"}
+    st.session_state.session_score = {"correct": 0, "partial": 0, "missed": 0}
+    st.session_state.study_indices = list(range(len(deck)))
+    st.session_state.current_index = card_index().locate(card["id"])[1]
+    st.session_state.due_queue = None
+    st.session_state.is_flipped = False
+    st.session_state.nav_phase = "session"
 
-def update_card_stats(card, is_correct):
-    if "stats" not in card:
-        card["stats"] = {"attempts": 0, "history": []}
-    card["stats"]["attempts"] += 1
-    card["stats"]["history"].append(is_correct)
-    if len(card["stats"]["history"]) > 20:
-        card["stats"]["history"].pop(0)
-    save_deck(st.session_state.username, st.session_state.deck_data)
+def trace_section(name):
+    # Times everything from here to the next section (or the end of the rerun)
+    if trace.ENABLED:
+        trace.phase(st.session_state.trace_reruns[-1], name)
 
 def update_session_score(result_type):
     # result_type: "correct", "partial", "missed"
@@ -96,7 +116,7 @@ if "username" not in st.session_state:
 if "nav_phase" not in st.session_state:
     st.session_state.nav_phase = "dashboard" # dashboard, config, session
 if "selected_list_name" not in st.session_state:
-    st.session_state.selected_list_name = None
+    st.session_state.selected_list_name = None # None in config/session: every list (Study Everything)
 if "session_settings" not in st.session_state:
     st.session_state.session_settings = {"order": "Sequential", "mode": "Flip Only"}
 if "session_score" not in st.session_state:
@@ -109,6 +129,10 @@ if "is_flipped" not in st.session_state:
     st.session_state.is_flipped = False
 if "study_indices" not in st.session_state:
     st.session_state.study_indices = []
+if "due_queue" not in st.session_state:
+    st.session_state.due_queue = None # Heap of due cards, only for the spaced repetition order
+if "mixed_sampler" not in st.session_state:
+    st.session_state.mixed_sampler = None # Draws across lists, only for Study Everything
 
 # Editor State
 if "selected_card_ids" not in st.session_state:
@@ -205,6 +229,7 @@ st.markdown("""
 
 # --- LOGIN FLOW ---
 if not st.session_state.logged_in:
+    trace_section("render.login")
     st.markdown("## ⚡ **Vibe Cards**")
     col1, col2 = st.columns([1,1])
     with col1:
@@ -215,8 +240,7 @@ if not st.session_state.logged_in:
             username_input = st.text_input("Username")
             password_input = st.text_input("Password", type="password")
             if st.form_submit_button("Log In"):
-                users = load_users()
-                if username_input in users and users[username_input] == password_input:
+                if check_login(username_input, password_input):
                     st.session_state.logged_in = True
                     st.session_state.username = username_input
                     st.session_state.deck_data = load_deck(username_input)
@@ -228,23 +252,28 @@ if not st.session_state.logged_in:
             new_username = st.text_input("Choose Username")
             new_password = st.text_input("Choose Password", type="password")
             if st.form_submit_button("Sign Up"):
-                users = load_users()
-                if new_username in users:
+                if not add_user(new_username, new_password):
                     st.error("Taken!")
                 else:
-                    users[new_username] = new_password
-                    save_users(users)
                     st.success("Created! Log in.")
 
 # --- APP FLOW ---
 else:
+    refresh_deck()
     # Sidebar Global Controls
+    trace_section("render.sidebar")
     with st.sidebar:
         st.title(f"👤 {st.session_state.username}")
-        app_mode = st.radio("App Section", ["Study Room", "Deck Editor"], index=0)
+        app_mode = st.radio("App Section", ["Study Room", "Deck Editor", "Analytics"], index=0)
         st.divider()
         if st.button("Logout"):
+            get_storage().compact(st.session_state.username, st.session_state.deck_data)
             st.session_state.logged_in = False
+            # Let go of the deck (and the indexes kept with it) until the next login
+            st.session_state.deck_data = None
+            st.session_state.due_queue = None
+            st.session_state.mixed_sampler = None
+            st.session_state.nav_phase = "dashboard"
             st.rerun()
 
     # =========================================================
@@ -254,10 +283,16 @@ else:
         
         # --- PHASE 1: DASHBOARD (List Selection) ---
         if st.session_state.nav_phase == "dashboard":
+            trace_section("render.dashboard")
             st.title("📚 Library")
             
-            # Search / Filter
-            search_query = st.text_input("Search Lists...", placeholder="Type to filter...").lower()
+            if st.button("🔀 Study Everything", help="One session drawing from all your lists, more often from the ones you miss most."):
+                st.session_state.selected_list_name = None
+                st.session_state.nav_phase = "config"
+                st.rerun()
+            
+            # Filter by list name (manifest only: no list is read)
+            search_query = st.text_input("Filter Lists...", placeholder="Type to filter...").lower()
             
             st.markdown("### Available Decks")
             
@@ -265,63 +300,110 @@ else:
             all_lists = list(st.session_state.deck_data.keys())
             filtered_lists = [l for l in all_lists if search_query in l.lower()]
             
+            now = time.time()
             if not filtered_lists:
                 st.info("No decks found matching your search.")
             else:
                 # Grid Layout for Lists
                 cols = st.columns(3)
                 for i, list_name in enumerate(filtered_lists):
-                    deck = st.session_state.deck_data[list_name]
+                    # Manifest entry only: the list's cards aren't read until it's opened
+                    summary = st.session_state.deck_data.summary(list_name, now)
                     with cols[i % 3]:
                         # Render a "Card" for the list
                         with st.container(border=True):
                             st.subheader(list_name)
-                            st.caption(f"{len(deck)} Cards")
+                            more_due = "+" if summary.get("next_due") is not None and summary["next_due"] <= now else ""
+                            caption = f"{summary.get('cards', 0)} Cards · {summary.get('due', 0)}{more_due} Due"
+                            if summary.get("last_studied"):
+                                caption += f" · Studied {time.strftime('%b %d', time.localtime(summary['last_studied']))}"
+                            st.caption(caption)
                             if st.button(f"Open {list_name}", key=f"btn_{list_name}", use_container_width=True):
                                 st.session_state.selected_list_name = list_name
                                 st.session_state.nav_phase = "config"
                                 st.rerun()
+            
+            # Card content search: its own box, since the inverted index reads every list
+            # (built on the first search, then kept with the deck)
+            st.markdown("### Search Cards")
+            card_query = st.text_input("Search Cards...", placeholder="Words from a front, back or distractor...")
+            if card_query.strip():
+                index = get_search_index(st.session_state.username, st.session_state.deck_data)
+                hits = index.search(card_query, limit=CARD_SEARCH_RESULTS)
+                if not hits:
+                    st.info("No cards found matching your search.")
+                for n, (list_name, card) in enumerate(hits):
+                    c_text, c_go = st.columns([4, 1])
+                    with c_text:
+                        st.markdown(f"**{card['front']}** → {card['back']}")
+                        st.caption(list_name)
+                    with c_go:
+                        if st.button("Study", key=f"hit_{n}", use_container_width=True):
+                            jump_to_card(list_name, card)
+                            st.rerun()
 
         # --- PHASE 2: CONFIGURATION ---
         elif st.session_state.nav_phase == "config":
+            trace_section("render.config")
             st.button("← Back to Library", on_click=lambda: st.session_state.update(nav_phase="dashboard"))
             
-            st.title(f"⚙️ Setup: {st.session_state.selected_list_name}")
+            study_all = st.session_state.selected_list_name is None
+            st.title(f"⚙️ Setup: {'All Lists' if study_all else st.session_state.selected_list_name}")
             
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown("#### 1. How should we order the cards?")
-                order = st.radio("Order", ["Sequential", "Random"], key="cfg_order")
+                if study_all:
+                    order = MIXED_ORDER
+                    st.caption("Cards come from every list, shuffled together: lists you miss more often come up more.")
+                else:
+                    order = st.radio("Order", ["Sequential", "Random", SPACED_ORDER], key="cfg_order")
             
             with col2:
                 st.markdown("#### 2. How do you want to study?")
                 mode = st.radio("Mode", ["Flip Only (Review)", "Test Myself (Interactive)"], key="cfg_mode")
+                auto_choice = st.checkbox(
+                    "Multiple choice for every card",
+                    key="cfg_auto_choice",
+                    disabled=mode != "Test Myself (Interactive)",
+                    help="Wrong options are picked from the list's other answers with the most similar spelling.",
+                )
             
             st.divider()
             
             if st.button("🚀 Start Session", type="primary", use_container_width=True):
                 # Init Session
-                st.session_state.session_settings = {"order": order, "mode": mode}
+                st.session_state.session_settings = {"order": order, "mode": mode, "auto_choice": auto_choice}
                 st.session_state.session_score = {"correct": 0, "partial": 0, "missed": 0}
                 st.session_state.current_index = 0
                 st.session_state.is_flipped = False
                 
                 # Prep Indices
-                deck = st.session_state.deck_data[st.session_state.selected_list_name]
-                indices = list(range(len(deck)))
-                if order == "Random":
-                    random.shuffle(indices)
-                st.session_state.study_indices = indices
+                st.session_state.due_queue = None
+                st.session_state.mixed_sampler = None
+                st.session_state.study_indices = []
+                if order == MIXED_ORDER:
+                    # Weighed from the manifest; cards are drawn one at a time, no index list
+                    st.session_state.mixed_sampler = MixedSampler(st.session_state.deck_data)
+                elif order == SPACED_ORDER:
+                    # Heapified once; each next card is then O(log n), no full index list
+                    st.session_state.due_queue = DueQueue(st.session_state.deck_data[st.session_state.selected_list_name])
+                else:
+                    indices = list(range(len(st.session_state.deck_data[st.session_state.selected_list_name])))
+                    if order == "Random":
+                        random.shuffle(indices)
+                    st.session_state.study_indices = indices
                 
                 st.session_state.nav_phase = "session"
                 st.rerun()
 
         # --- PHASE 3: SESSION ---
         elif st.session_state.nav_phase == "session":
-            deck_name = st.session_state.selected_list_name
-            deck = st.session_state.deck_data[deck_name]
+            trace_section("render.session")
             indices = st.session_state.study_indices
             settings = st.session_state.session_settings
+            due_queue = st.session_state.due_queue if settings["order"] == SPACED_ORDER else None
+            sampler = st.session_state.mixed_sampler if settings["order"] == MIXED_ORDER else None
             
             # Header with Scoreboard (if testing)
             col_head, col_score = st.columns([1, 2])
@@ -337,15 +419,23 @@ else:
                     c3.markdown(f"<div class='score-box' style='color:#f87171'>Missed: {s['missed']}</div>", unsafe_allow_html=True)
 
             # Progress
-            if len(indices) == 0:
+            pending = sampler if sampler is not None else due_queue if due_queue is not None else indices
+            if len(pending) == 0 or (sampler is not None and sampler.peek() is None):
                 st.warning("Empty Deck.")
                 st.stop()
                 
-            if st.session_state.current_index >= len(indices):
-                st.session_state.current_index = 0 # Loop or finish? Loop for now.
-            
-            real_index = indices[st.session_state.current_index]
-            card = deck[real_index]
+            if sampler is not None:
+                deck_name, real_index = sampler.peek()
+                st.caption(f"From {deck_name}")
+            else:
+                deck_name = st.session_state.selected_list_name
+                if due_queue is not None:
+                    real_index = due_queue.peek()
+                else:
+                    if st.session_state.current_index >= len(indices):
+                        st.session_state.current_index = 0 # Loop or finish? Loop for now.
+                    real_index = indices[st.session_state.current_index]
+            card = st.session_state.deck_data[deck_name][real_index]
             
             # --- THE CARD UI ---
             st.write("") # Spacer
@@ -353,10 +443,15 @@ else:
             # Determine Interaction Type
             # If "Test Myself", we look at card capabilities. Priority: Choice > Write > Flip
             interaction_type = "Flip"
+            choice_opts = None
             if settings["mode"] == "Test Myself (Interactive)":
-                if card.get("enable_choice") and card.get("distractors"):
+                if card["enable_choice"] or settings.get("auto_choice"):
+                    # Hand-written distractors, topped up from the list's other answers
+                    dindex = get_distractor_index(st.session_state.username, st.session_state.deck_data, deck_name)
+                    choice_opts = choice_options(card, dindex)
+                if choice_opts:
                     interaction_type = "Choice"
-                elif card.get("enable_write"):
+                elif card["enable_write"]:
                     interaction_type = "Write"
             
             # OPEN CSS CONTAINER FOR CARD
@@ -385,25 +480,25 @@ else:
                     user_input = st.text_input("Answer", key=f"write_{card['id']}", label_visibility="collapsed")
                     if user_input:
                         # Auto-grade
-                        sim = check_similarity(user_input, card["back"])
+                        grade = grade_answer(user_input, card["back"])
                         st.session_state.is_flipped = True
-                        if sim == 1.0:
+                        if grade == "correct":
                             st.success("Perfect!")
-                            update_card_stats(card, True)
+                            update_card_stats(card["id"], True)
                             update_session_score("correct")
-                        elif sim > 0.7:
+                        elif grade == "partial":
                             st.warning(f"Close! It was: {card['back']}")
-                            update_card_stats(card, False)
+                            update_card_stats(card["id"], False)
                             update_session_score("partial")
                         else:
                             st.error(f"Incorrect. It was: {card['back']}")
-                            update_card_stats(card, False)
+                            update_card_stats(card["id"], False)
                             update_session_score("missed")
                         st.button("Next Card ->") # Just to trigger rerun to show flipped state
                 
                 elif interaction_type == "Choice":
                     st.write("Select the correct answer:")
-                    opts = card.get("distractors", []) + [card["back"]]
+                    opts = list(choice_opts)
                     random.Random(card['id']).shuffle(opts)
                     
                     # We use columns to make buttons look like choices
@@ -412,11 +507,11 @@ else:
                             st.session_state.is_flipped = True
                             if opt == card["back"]:
                                 st.success("Correct!")
-                                update_card_stats(card, True)
+                                update_card_stats(card["id"], True)
                                 update_session_score("correct")
                             else:
                                 st.error(f"Wrong! It was {card['back']}")
-                                update_card_stats(card, False)
+                                update_card_stats(card["id"], False)
                                 update_session_score("missed")
                             st.rerun()
 
@@ -434,35 +529,40 @@ else:
                     c1, c2 = st.columns(2)
                     with c1:
                         if st.button("Got it right", use_container_width=True):
-                            update_card_stats(card, True)
-                            st.session_state.is_flipped = False
-                            st.session_state.current_index = (st.session_state.current_index + 1) % len(indices)
+                            update_card_stats(card["id"], True)
+                            advance_session(card)
                             st.rerun()
                     with c2:
                         if st.button("Missed it", use_container_width=True):
-                            update_card_stats(card, False)
-                            st.session_state.is_flipped = False
-                            st.session_state.current_index = (st.session_state.current_index + 1) % len(indices)
+                            update_card_stats(card["id"], False)
+                            advance_session(card)
                             st.rerun()
                 else:
                     # Interactive Mode just needs a Next button since grading happened on submit
                     if st.button("Next Card ➡️", use_container_width=True):
-                        st.session_state.is_flipped = False
-                        st.session_state.current_index = (st.session_state.current_index + 1) % len(indices)
+                        advance_session(card)
                         st.rerun()
 
             # CLOSE CSS CONTAINER
             st.markdown('</div>', unsafe_allow_html=True)
             
             # Footer Nav
-            progress = (st.session_state.current_index + 1) / len(indices)
-            st.progress(progress)
-            st.caption(f"Card {st.session_state.current_index + 1} of {len(indices)}")
+            if sampler is not None:
+                st.progress(min(sampler.drawn / len(sampler), 1.0))
+                st.caption(f"Card {sampler.drawn} of {len(sampler)} · {len(sampler.lists)} lists" + (f" · Round {sampler.rounds}" if sampler.rounds > 1 else ""))
+            elif due_queue is not None:
+                st.progress(due_queue.reviewed / (due_queue.reviewed + due_queue.due_now) if due_queue.due_now else 1.0)
+                st.caption(f"{due_queue.due_now} due now · {due_queue.reviewed} reviewed")
+            else:
+                progress = (st.session_state.current_index + 1) / len(indices)
+                st.progress(progress)
+                st.caption(f"Card {st.session_state.current_index + 1} of {len(indices)}")
 
     # =========================================================
     # SECTION: EDITOR (Admin)
     # =========================================================
     elif app_mode == "Deck Editor":
+        trace_section("render.editor")
         st.title("✏️ Deck Editor")
         
         # Select Deck to Edit
@@ -476,13 +576,13 @@ else:
             if st.button("Create Deck") and new_deck_name:
                 if new_deck_name not in st.session_state.deck_data:
                     st.session_state.deck_data[new_deck_name] = []
-                    save_deck(st.session_state.username, st.session_state.deck_data)
+                    save_deck(st.session_state.username, st.session_state.deck_data, [new_deck_name])
                     st.success("Created!")
                     st.rerun()
         with c_new2:
             if st.button("Delete Current Deck") and len(deck_names) > 1:
-                del st.session_state.deck_data[active_deck]
-                save_deck(st.session_state.username, st.session_state.deck_data)
+                card_index().delete_list(active_deck)
+                save_deck(st.session_state.username, st.session_state.deck_data, ())
                 st.rerun()
                 
         st.divider()
@@ -497,30 +597,194 @@ else:
             with c1: en_write = st.checkbox("Enable Typing")
             with c2: en_choice = st.checkbox("Enable Choice")
             
-            distractors = st.text_area("Distractors (one per line, for Choice)")
+            distractors = st.text_area("Distractors (one per line, for Choice)", help="Leave empty to pick them from the list's other answers.")
             
             if st.form_submit_button("Add Card"):
                 d_list = [x.strip() for x in distractors.split('\n') if x.strip()]
-                st.session_state.deck_data[active_deck].append({
-                    "id": random.randint(100000, 999999),
+                card_index().add(active_deck, {
+                    "id": card_index().allocate_id(),
                     "front": front,
                     "back": back,
                     "enable_write": en_write,
                     "enable_choice": en_choice,
                     "distractors": d_list,
-                    "stats": {"attempts": 0, "history": []}
+                    "stats": new_stats()
                 })
-                save_deck(st.session_state.username, st.session_state.deck_data)
+                save_deck(st.session_state.username, st.session_state.deck_data, [active_deck])
                 st.success("Added!")
         
+        # Bulk Import
+        with st.expander(f"Bulk Import into '{active_deck}' (CSV / TSV / JSONL)"):
+            st.caption("Columns: front, back, and optionally distractors (separated by |), enable_write, enable_choice.")
+            uploaded = st.file_uploader("Cards File", type=["csv", "tsv", "txt", "jsonl", "ndjson"])
+            if uploaded is not None and st.button("Import Cards"):
+                try:
+                    report = import_cards(st.session_state.username, active_deck, open_upload(uploaded), detect_format(uploaded.name))
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.session_state.deck_data = load_deck(st.session_state.username)
+                    drop_indexes(st.session_state.deck_data) # The same cached object on JSON
+                    st.success(f"Imported {report.imported} cards, skipped {report.skipped}.")
+                    for line_no, message in report.errors:
+                        st.warning(f"Line {line_no}: {message}")
+
+        # Export (built only when the download is clicked, on Streamlit's own thread)
+        with st.expander("Export"):
+            c_scope, c_fmt = st.columns(2)
+            with c_scope: export_scope = st.radio("Cards", [f"'{active_deck}' only", "All decks"], key="export_scope")
+            with c_fmt: export_fmt = st.radio("Format", list(EXPORT_FORMATS), key="export_fmt")
+            fmt = EXPORT_FORMATS[export_fmt]
+            export_lists = None if export_scope == "All decks" or fmt == "zip" else [active_deck]
+            export_name = active_deck if export_lists else st.session_state.username
+            st.download_button(
+                "Download",
+                data=partial(export_deck, st.session_state.username, st.session_state.deck_data, fmt, export_lists),
+                file_name=f"{export_name}{EXPORT_EXTENSIONS[fmt]}",
+                on_click="ignore",
+            )
+        
         st.divider()
         
         # List Cards
         st.subheader("Manage Cards")
         current_deck = st.session_state.deck_data[active_deck]
-        for i, card in enumerate(current_deck):
-            with st.expander(f"{card['front']} -> {card['back']}"):
-                if st.button("Delete", key=f"del_{card['id']}"):
-                    st.session_state.deck_data[active_deck].pop(i)
-                    save_deck(st.session_state.username, st.session_state.deck_data)
-                    st.rerun()
\ No newline at end of file
+        c_filter, c_sort, c_size = st.columns([2, 1, 1])
+        with c_filter: card_query = st.text_input("Filter Cards", placeholder="Search front or back...").lower().strip()
+        with c_sort: sort_by = st.selectbox("Sort By", CARD_SORTS)
+        with c_size: page_size = st.selectbox("Cards Per Page", PAGE_SIZES, index=1)
+        
+        positions = matching_cards(current_deck, card_query)
+        total = len(positions)
+        page_count = max(1, -(-total // page_size))
+        page_key = f"page_{active_deck}"
+        if st.session_state.get(page_key, 1) > page_count:
+            st.session_state[page_key] = page_count # Filter or page size shrank the results
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, key=page_key)
+        visible = page_of_cards(current_deck, positions, sort_by, page, page_size)
+        
+        if not visible:
+            st.info("No cards match.")
+        else:
+            st.caption(f"Showing {len(visible)} of {total} cards")
+            rows = []
+            for i in visible:
+                card = current_deck[i]
+                acc = recent_accuracy(card["stats"])
+                rows.append({
+                    "#": i + 1,
+                    "Front": card["front"],
+                    "Back": card["back"],
+                    "Attempts": card["stats"]["attempts"],
+                    "Accuracy": "-" if acc is None else f"{acc:.0%}",
+                })
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+            
+            visible_ids = [current_deck[i]["id"] for i in visible]
+            describe = lambda card_id: f"{card_index().card(card_id)['front']} -> {card_index().card(card_id)['back']}"
+            
+            to_delete = st.multiselect("Select cards to delete", visible_ids, format_func=describe)
+            st.session_state.selected_card_ids = set(to_delete)
+            if st.button("Delete Selected", disabled=not to_delete):
+                card_index().delete(to_delete)
+                save_deck(st.session_state.username, st.session_state.deck_data, [active_deck])
+                st.rerun()
+            
+            # Edit Card
+            edit_id = st.selectbox("Edit card", [None] + visible_ids, format_func=lambda c: "—" if c is None else describe(c))
+            if edit_id is not None:
+                card = card_index().card(edit_id)
+                with st.form(f"edit_{edit_id}"):
+                    e_front = st.text_input("Front (Question)", value=card["front"])
+                    e_back = st.text_input("Back (Answer)", value=card["back"])
+                    c1, c2 = st.columns(2)
+                    with c1: e_write = st.checkbox("Enable Typing", value=card["enable_write"])
+                    with c2: e_choice = st.checkbox("Enable Choice", value=card["enable_choice"])
+                    e_distractors = st.text_area("Distractors (one per line, for Choice)", help="Leave empty to pick them from the list's other answers.", value="\n".join(card["distractors"]))
+                    
+                    if st.form_submit_button("Save Card"):
+                        edited_list = card_index().edit(edit_id, {
+                            "front": e_front,
+                            "back": e_back,
+                            "enable_write": e_write,
+                            "enable_choice": e_choice,
+                            "distractors": [x.strip() for x in e_distractors.split('\n') if x.strip()],
+                        })
+                        save_deck(st.session_state.username, st.session_state.deck_data, [edited_list])
+                        st.success("Saved!")
+                        st.rerun()
+
+    # =========================================================
+    # SECTION: ANALYTICS
+    # =========================================================
+    elif app_mode == "Analytics":
+        trace_section("render.analytics")
+        st.title("📈 Analytics")
+        # Aggregates are built once per loaded deck and then updated per answer,
+        # so this page doesn't scan the deck
+        analytics = get_analytics(st.session_state.username, st.session_state.deck_data)
+        
+        totals = analytics.totals()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Cards", totals["cards"])
+        c2.metric("Studied", totals["studied"])
+        c3.metric("Answers", totals["attempts"])
+        c4.metric("Recent Accuracy", "-" if totals["accuracy"] is None else f"{totals['accuracy']:.0%}")
+        
+        st.subheader("By List")
+        rows = []
+        for list_name in st.session_state.deck_data:
+            summary = analytics.list_summary(list_name)
+            rows.append({
+                "List": list_name,
+                "Cards": summary["cards"],
+                "Studied": summary["studied"],
+                "Answers": summary["attempts"],
+                "Recent Accuracy": "-" if summary["accuracy"] is None else f"{summary['accuracy']:.0%}",
+            })
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        
+        st.subheader("Hardest Cards")
+        top_k = st.slider("How many", min_value=5, max_value=50, value=HARDEST_LIMIT, step=5)
+        hardest = analytics.hardest(top_k)
+        if not hardest:
+            st.info("Answer a card at least twice to see how hard it is.")
+        else:
+            st.dataframe([
+                {
+                    "Front": card["front"],
+                    "Back": card["back"],
+                    "List": list_name,
+                    "Recent Accuracy": f"{accuracy:.0%}",
+                    "Attempts": card["stats"]["attempts"],
+                }
+                for list_name, card, accuracy in hardest
+            ], use_container_width=True, hide_index=True)
+
+# --- Debug Panel (VIBE_CARDS_TRACE=1) ---
+if trace.ENABLED:
+    trace.end_rerun(st.session_state.trace_reruns[-1])
+    reruns = [r for r in st.session_state.trace_reruns if r.duration is not None]
+    latest = reruns[-1]
+    with st.sidebar.expander("⏱ Performance"):
+        st.caption(f"Last {len(reruns)} reruns, newest first")
+        st.dataframe([
+            {
+                "rerun": r.id,
+                "ms": round(r.duration * 1000, 1),
+                "section": next((s["name"] for s in r.spans if s["depth"] == 0 and s["name"].startswith("render.")), ""),
+                "cut short": r.interrupted,
+            }
+            for r in reversed(reruns)
+        ], hide_index=True)
+        st.markdown(f"**Rerun {latest.id}: {latest.duration * 1000:.1f} ms**")
+        st.dataframe([
+            {"span": name, "calls": calls, "ms": round(total * 1000, 2)}
+            for name, (calls, total) in latest.breakdown().items()
+        ], hide_index=True)
+        if trace.background:
+            writes = list(trace.background)[-5:]
+            st.caption("Background: " + ", ".join(f"{s['name']} {s['dur'] * 1000:.1f} ms" for s in writes))
+        st.download_button("Download JSONL", trace.to_jsonl(reruns), file_name="vibe_cards_trace.jsonl")
+        st.download_button("Download Chrome trace", trace.to_chrome_trace(reruns, trace.background),
+                           file_name="vibe_cards_trace.json")
@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+
+import pytest
+
+from vibe_cards import storage as storage_module
+from vibe_cards.card_stats import new_stats
+from vibe_cards.storage import JsonStorage, atomic_write_json, create_json, read_json
+
+USER = "alice"
+
+
+# --- Helpers ---
+# Two JsonStorage instances on one folder stand in for two processes: each has its
+# own cache and write-behind queue, and only the files (and their locks) are shared.
+@pytest.fixture
+def folder(tmp_path):
+    # The welcome deck, written once
+    first = JsonStorage(str(tmp_path))
+    first.compact(USER, first.load_deck(USER))
+    return str(tmp_path)
+
+def new_card(card_id, front="front", back="back"):
+    return {
+        "id": card_id, "front": front, "back": back, "enable_write": False, "enable_choice": False,
+        "distractors": [], "stats": new_stats(),
+    }
+
+def answer(storage, deck, list_name="Default", position=0, is_correct=True):
+    storage.record_review(USER, deck, list_name, position, deck[list_name][position], is_correct)
+
+def stored_deck(folder):
+    # What a process starting now would load
+    return JsonStorage(folder).load_deck(USER).load_all()
+
+def ids(deck):
+    return sorted(card["id"] for cards in deck.values() for card in cards)
+
+
+# --- Answers From Several Processes ---
+def test_answers_logged_by_both_processes_are_kept(folder):
+    a, b = JsonStorage(folder), JsonStorage(folder)
+    deck_a, deck_b = a.load_deck(USER), b.load_deck(USER)
+    answer(a, deck_a)
+    answer(b, deck_b)
+    answer(a, deck_a)
+    assert deck_a["Default"][0]["stats"]["attempts"] == 3 # b's answer caught up from the log
+    a.compact(USER, deck_a)
+    b.compact(USER, deck_b)
+    assert stored_deck(folder)["Default"][0]["stats"]["attempts"] == 3
+
+def test_answer_after_other_process_compacted(folder):
+    a, b = JsonStorage(folder), JsonStorage(folder)
+    deck_a = a.load_deck(USER)
+    answer(a, deck_a)
+    deck_b = b.load_deck(USER) # Replays a's logged answer
+    answer(b, deck_b)
+    b.compact(USER, deck_b) # Lists rewritten, log removed: a's log offset no longer applies
+    answer(a, deck_a)
+    a.compact(USER, deck_a) # Nothing of a's own to write; its answer is in the new log
+    assert stored_deck(folder)["Default"][0]["stats"]["attempts"] == 3
+    assert a.refresh_deck(USER, deck_a)["Default"][0]["stats"]["attempts"] == 3
+
+def test_replay_resumes_after_a_partial_line(folder):
+    a = JsonStorage(folder)
+    deck = a.load_deck(USER)
+    answer(a, deck)
+    with open(a.get_user_review_log(USER), "ab") as f:
+        f.write(b'{"list": "Default", "pos": 0') # Another process halfway through its append
+    fresh = JsonStorage(folder).load_deck(USER)
+    assert fresh["Default"][0]["stats"]["attempts"] == 1
+    replayed, end = a.replay_review_log(USER, fresh)
+    assert replayed == 1 and end < os.path.getsize(a.get_user_review_log(USER))
+
+def test_concurrent_answers_are_all_recorded(folder):
+    storages = [JsonStorage(folder), JsonStorage(folder)]
+    decks = [s.load_deck(USER) for s in storages]
+
+    def study(storage, deck):
+        for _ in range(50):
+            answer(storage, deck)
+
+    threads = [threading.Thread(target=study, args=pair) for pair in zip(storages, decks)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for storage, deck in zip(storages, decks):
+        storage.compact(USER, deck)
+    assert stored_deck(folder)["Default"][0]["stats"]["attempts"] == 100
+
+def test_review_history_outlives_compaction(folder):
+    a = JsonStorage(folder)
+    deck = a.load_deck(USER)
+    answer(a, deck, is_correct=True)
+    a.compact(USER, deck) # The log is folded into the lists
+    answer(a, deck, is_correct=False) # Still in the log
+    reviews = list(JsonStorage(folder).iter_reviews(USER))
+    assert [(review["id"], review["ok"]) for review in reviews] == [(1, True), (1, False)]
+    assert reviews[0]["ts"] <= reviews[1]["ts"]
+
+
+# --- Edits Merged Over Another Process's Write ---
+def test_new_cards_renumbered_when_ids_collide(folder):
+    a, b = JsonStorage(folder), JsonStorage(folder)
+    deck_a, deck_b = a.load_deck(USER), b.load_deck(USER)
+    deck_a["Default"].append(new_card(deck_a.allocate_id(), "from a"))
+    a.save_deck(USER, deck_a, ["Default"])
+    deck_b["Other"] = [new_card(deck_b.allocate_id(), "from b")]
+    b.save_deck(USER, deck_b, ["Other"])
+    b.compact(USER, deck_b)
+    a.compact(USER, deck_a) # Finds b's write, merges onto it
+
+    stored = stored_deck(folder)
+    assert list(stored) == ["Default", "Other"]
+    assert [card["front"] for card in stored["Default"]][1:] == ["from a"]
+    assert [card["front"] for card in stored["Other"]] == ["from b"]
+    assert ids(stored) == [1, 2, 3]
+    assert stored.next_id == 4
+
+def test_merge_keeps_other_process_answers_and_deletions(folder):
+    a, b = JsonStorage(folder), JsonStorage(folder)
+    deck_a = a.load_deck(USER)
+    deck_a["Spare"] = [new_card(deck_a.allocate_id())]
+    a.save_deck(USER, deck_a, ["Spare"])
+    a.compact(USER, deck_a)
+
+    deck_b = b.load_deck(USER)
+    answer(b, deck_b)
+    b.compact(USER, deck_b)
+    del deck_a["Spare"]
+    deck_a["Default"][0]["front"] = "edited by a"
+    a.save_deck(USER, deck_a, ["Default"])
+    a.compact(USER, deck_a)
+
+    stored = stored_deck(folder)
+    assert list(stored) == ["Default"]
+    assert stored["Default"][0]["front"] == "edited by a"
+    assert stored["Default"][0]["stats"]["attempts"] == 1 # b's answer, not a's stale copy
+    assert len(os.listdir(a.get_user_lists_folder(USER))) == 1
+
+def test_refresh_picks_up_other_process_write(folder):
+    a, b = JsonStorage(folder), JsonStorage(folder)
+    deck_a, deck_b = a.load_deck(USER), b.load_deck(USER)
+    assert a.refresh_deck(USER, deck_a) is deck_a
+    deck_b["Other"] = [new_card(deck_b.allocate_id())]
+    b.save_deck(USER, deck_b, ["Other"])
+    b.compact(USER, deck_b)
+    refreshed = a.refresh_deck(USER, deck_a)
+    assert refreshed is not deck_a and "Other" in refreshed
+
+
+# --- Atomic And Locked Writes ---
+def test_failed_atomic_write_keeps_old_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.json")
+    atomic_write_json(path, {"v": 1})
+
+    def fail(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "fsync", fail)
+    with pytest.raises(OSError):
+        atomic_write_json(path, {"v": 2})
+    assert read_json(path) == {"v": 1}
+    assert os.listdir(tmp_path) == ["data.json"]
+
+def test_create_json_only_creates_once(tmp_path):
+    path = str(tmp_path / "account.json")
+    assert create_json(path, {"n": 1})
+    assert not create_json(path, {"n": 2})
+    assert read_json(path) == {"n": 1}
+
+def test_failed_background_write_is_retried(folder, monkeypatch):
+    monkeypatch.setattr(storage_module, "WRITE_RETRY_DELAY", 0.05)
+    real_write = storage_module.atomic_write_json
+    failures = [OSError(28, "No space left on device")]
+
+    def flaky_write(path, data):
+        if failures:
+            raise failures.pop()
+        real_write(path, data)
+
+    monkeypatch.setattr(storage_module, "atomic_write_json", flaky_write)
+    a = JsonStorage(folder)
+    a.writer.delay = 0
+    deck = a.load_deck(USER)
+    deck["Default"].append(new_card(deck.allocate_id()))
+    a.save_deck(USER, deck, ["Default"])
+    deadline = time.monotonic() + 5
+    while len(JsonStorage(folder).load_deck(USER)["Default"]) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not failures
+    assert len(stored_deck(folder)["Default"]) == 2
+    assert not deck.dirty
+
+def test_failed_background_write_is_flushed_on_compact(folder, monkeypatch):
+    real_write = storage_module.atomic_write_json
+    failures = [OSError(28, "No space left on device")]
+
+    def flaky_write(path, data):
+        if failures:
+            raise failures.pop()
+        real_write(path, data)
+
+    monkeypatch.setattr(storage_module, "atomic_write_json", flaky_write)
+    a = JsonStorage(folder)
+    deck = a.load_deck(USER)
+    deck["Default"].append(new_card(deck.allocate_id()))
+    a.save_deck(USER, deck, ["Default"])
+    a.writer.flush() # The write fails and is queued again
+    assert not failures and deck.dirty == {"Default"}
+    a.compact(USER, deck) # Logout: retried now, not left to the retry timer
+    assert not deck.dirty
+    assert len(stored_deck(folder)["Default"]) == 2
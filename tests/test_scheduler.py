@@ -0,0 +1,13 @@
+from vibe_cards.card_stats import new_stats
+from vibe_cards.scheduler import SKIP_DELAY, DueQueue
+
+
+# --- Study Queue ---
+def test_skipped_cards_count_as_due_again():
+    cards = [{"id": card_id, "stats": new_stats()} for card_id in range(3)]
+    queue = DueQueue(cards)
+    now = 1_000_000.0
+    assert queue.count_due(now) == 3
+    queue.advance(cards[queue.peek()], now) # Seen, not graded
+    assert queue.count_due(now) == 2
+    assert queue.count_due(now + SKIP_DELAY) == 3 # Back once the skip delay is over
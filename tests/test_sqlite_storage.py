@@ -0,0 +1,66 @@
+import pytest
+
+from vibe_cards.card_index import CardIndex
+from vibe_cards.card_stats import new_stats
+from vibe_cards.deck import list_tally
+from vibe_cards.storage import SqliteStorage
+
+USER = "alice"
+
+
+# --- Helpers ---
+def new_card(card_id, front="front"):
+    return {
+        "id": card_id, "front": front, "back": "back", "enable_write": False, "enable_choice": False,
+        "distractors": [], "stats": new_stats(),
+    }
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "vibe_cards.db")
+    SqliteStorage(path).save_deck(USER, {"Big": [new_card(card_id, f"card {card_id}") for card_id in range(1, 201)]})
+    return path
+
+
+# --- Row-Level Saves ---
+def test_card_changes_write_only_their_rows(db_path):
+    storage = SqliteStorage(db_path)
+    deck = storage.load_deck(USER)
+    deck.summary("Big")
+    index = CardIndex(deck)
+    index.add("Big", new_card(index.allocate_id(), "added"))
+    index.delete([50, 60])
+    index.edit(70, {"front": "edited"})
+    assert deck.card_changes == {"Big": {201, 50, 60, 70}}
+    storage.save_deck(USER, deck, ["Big"])
+
+    stored = SqliteStorage(db_path).load_deck(USER)
+    cards = stored["Big"]
+    assert [card["id"] for card in cards] == [card["id"] for card in deck["Big"]]
+    assert cards[-1]["front"] == "added"
+    assert next(card for card in cards if card["id"] == 70)["front"] == "edited"
+    expected = list_tally(cards)[0]
+    assert expected["cards"] == 199
+    for summary in (stored.manifest["Big"], deck.summary("Big")): # Kept up to date card by card
+        assert {key: summary[key] for key in expected} == expected
+
+def test_card_edit_keeps_answers_stored_since(db_path):
+    storage, other = SqliteStorage(db_path), SqliteStorage(db_path)
+    deck, other_deck = storage.load_deck(USER), other.load_deck(USER)
+    deck["Big"] # Loaded before the other process answers
+    other.record_review(USER, other_deck, "Big", 0, other_deck["Big"][0], True)
+    CardIndex(deck).edit(1, {"back": "new back"})
+    storage.save_deck(USER, deck, ["Big"])
+    card = SqliteStorage(db_path).load_deck(USER)["Big"][0]
+    assert card["back"] == "new back" and card["stats"]["attempts"] == 1
+
+def test_replacing_a_deck_is_one_transaction(db_path, monkeypatch):
+    storage = SqliteStorage(db_path)
+
+    def fail(*args):
+        raise OSError("disk I/O error")
+
+    monkeypatch.setattr(storage, "insert_cards", fail)
+    with pytest.raises(OSError):
+        storage.save_deck(USER, {"Other": [new_card(1)]})
+    assert list(SqliteStorage(db_path).load_deck(USER)) == ["Big"]
@@ -0,0 +1,81 @@
+import asyncio
+import heapq
+import random
+import time
+
+from vibe_cards.auth import hash_password
+from vibe_cards.card_index import get_card_index
+from vibe_cards.card_stats import new_stats
+from vibe_cards.scheduler import card_due
+from vibe_cards.server import SyncService
+from vibe_cards.storage import JsonStorage
+from vibe_cards.sync import due_cards, record_answers
+
+USER = "alice"
+
+
+# --- Helpers ---
+def new_card(front="front"):
+    return {
+        "front": front, "back": "back", "enable_write": False, "enable_choice": False,
+        "distractors": [], "stats": new_stats(),
+    }
+
+def every_due_card(deck, limit, horizon):
+    # The old full scan, as the reference
+    due = [(card_due(card), card["id"], name) for name in deck for card in deck[name] if card_due(card) <= horizon]
+    return [(name, card_id) for _, card_id, name in heapq.nsmallest(limit, due)]
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.decode("latin-1")
+
+
+# --- Next Due Cards ---
+def test_due_cards_follow_answers_and_edits(tmp_path):
+    storage = JsonStorage(str(tmp_path))
+    deck = storage.load_deck(USER)
+    for name in ("A", "B"):
+        deck[name] = [dict(new_card(), id=deck.allocate_id()) for _ in range(100)]
+    index = get_card_index(USER, deck)
+    rng = random.Random(0)
+    for step in range(200):
+        card_ids = [card["id"] for name in deck for card in deck[name]]
+        roll = rng.random()
+        if roll < 0.7:
+            record_answers(USER, deck, [(rng.choice(card_ids), rng.random() < 0.7, None) for _ in range(3)], storage)
+        elif roll < 0.85:
+            index.delete([rng.choice(card_ids)])
+        else:
+            index.add(rng.choice(["A", "B"]), new_card())
+        within = rng.choice([0, 3600, 30 * 86400])
+        now = time.time()
+        served = [(name, card["id"]) for name, card in due_cards(deck, 20, within, now=now)]
+        assert served == every_due_card(deck, 20, now + within)
+
+
+# --- HTTP ---
+def test_bad_content_length_is_a_400(tmp_path):
+    async def run():
+        service = SyncService(JsonStorage(str(tmp_path)))
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        response = await request(port, b"POST /login HTTP/1.1\r\nContent-Length: ten\r\n\r\n")
+        server.close()
+        return response
+
+    response = asyncio.run(run())
+    assert response.startswith("HTTP/1.1 400 ")
+    assert "Connection: close" in response
+
+def test_login_prunes_expired_tokens(tmp_path):
+    storage = JsonStorage(str(tmp_path))
+    storage.add_user(USER, hash_password("secret"))
+    service = SyncService(storage)
+    service.tokens["expired"] = (USER, time.time() - 1)
+    token = service.login({"username": USER, "password": "secret"})["token"]
+    assert list(service.tokens) == [token]
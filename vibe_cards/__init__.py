@@ -0,0 +1,49 @@
+# Vibe Cards core: storage, scheduling, grading, search and import, with no UI.
+# flash_cards.py is one front end; benchmarks/ and the module CLIs are others.
+#
+# Submodules are imported on first use, so `import vibe_cards` is free and a
+# script that only grades answers never loads the storage backends.
+import importlib
+
+_EXPORTS = {
+    "get_storage": "storage",
+    "JsonStorage": "storage",
+    "SqliteStorage": "storage",
+    "new_stats": "card_stats",
+    "apply_review": "card_stats",
+    "recent_accuracy": "card_stats",
+    "schedule_review": "scheduler",
+    "DueQueue": "scheduler",
+    "MixedSampler": "sampler",
+    "grade_answer": "grading",
+    "grade_batch": "grading",
+    "import_cards": "importer",
+    "export_deck": "exporter",
+    "record_answers": "sync",
+    "due_cards": "sync",
+    "CardSearchIndex": "search_index",
+    "get_search_index": "search_index",
+    "CardIndex": "card_index",
+    "get_card_index": "card_index",
+    "DeckAnalytics": "analytics",
+    "get_analytics": "analytics",
+    "DistractorIndex": "distractors",
+    "choice_options": "distractors",
+    "get_distractor_index": "distractors",
+    "drop_indexes": "registry",
+    "hash_password": "auth",
+    "verify_password": "auth",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value # Later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,202 @@
+import heapq
+import threading
+
+from . import registry
+from .card_stats import HISTORY_SIZE, recent_correct
+from .trace import span
+
+try:
+    import numpy as np # Vectorized backfill; without it the same numbers come from a plain loop
+except ImportError:
+    np = None
+
+# --- Constants & Config ---
+HARDEST_MIN_ANSWERS = 2 # A single miss doesn't make a card "hard" yet
+HARDEST_LIMIT = 10
+
+
+def card_totals(stats):
+    # (attempts, correct answers in the kept history, answers in the kept history)
+    return stats.get("attempts", 0), recent_correct(stats), min(stats.get("hist_len", 0), HISTORY_SIZE)
+
+def hardness_key(card_id, totals):
+    # Heap order: lowest recent accuracy first, then the most attempted
+    attempts, correct, answered = totals
+    if answered < HARDEST_MIN_ANSWERS:
+        return None
+    return (correct / answered, -attempts, card_id)
+
+
+# --- Per-Deck Aggregates ---
+class DeckAnalytics:
+    # Per-list sums of attempts and recent answers, plus a heap of cards by hardness.
+    # Built once per loaded deck (vectorized), then kept current one answer at a time,
+    # so the analytics page costs O(lists + k log n) however big the deck is.
+
+    def __init__(self, deck_data):
+        self.deck_data = deck_data
+        self.lists = {} # list name -> [cards, studied cards, attempts, correct, answered]
+        self.cards = {} # card id -> (list name, card, totals)
+        self.heap = [] # (accuracy, -attempts, card id); stale entries are skipped lazily
+        self.current = {} # card id -> its live heap entry
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, deck_data):
+        with span("analytics.build") as s:
+            analytics = cls(deck_data)
+            if np is not None:
+                analytics._build_vectorized()
+            else:
+                for list_name, lst in deck_data.items():
+                    for card in lst:
+                        analytics._add(list_name, card)
+            s.set(cards=len(analytics.cards))
+        return analytics
+
+    def _build_vectorized(self):
+        names = list(self.deck_data)
+        counts = [len(self.deck_data[name]) for name in names]
+        cards = [card for name in names for card in self.deck_data[name]]
+        n = len(cards)
+        stats = [card.get("stats", {}) for card in cards]
+        attempts = np.fromiter((s.get("attempts", 0) for s in stats), dtype=np.int64, count=n)
+        hist = np.fromiter((s.get("hist", 0) for s in stats), dtype=np.uint64, count=n)
+        answered = np.fromiter((min(s.get("hist_len", 0), HISTORY_SIZE) for s in stats), dtype=np.int64, count=n)
+        correct = popcount(hist & ((np.uint64(1) << answered.astype(np.uint64)) - np.uint64(1)))
+        ids = np.fromiter((card["id"] for card in cards), dtype=np.int64, count=n)
+
+        list_of = np.repeat(np.arange(len(names)), counts)
+        sums = [
+            np.bincount(list_of, weights=values, minlength=len(names)).astype(np.int64).tolist()
+            for values in (attempts > 0, attempts, correct, answered)
+        ]
+        for i, name in enumerate(names):
+            self.lists[name] = [counts[i]] + [column[i] for column in sums]
+
+        list_names = [name for name, count in zip(names, counts) for _ in range(count)]
+        totals = zip(attempts.tolist(), correct.tolist(), answered.tolist())
+        self.cards = dict(zip(ids.tolist(), zip(list_names, cards, totals)))
+
+        # Sorted by (accuracy, -attempts, id), which is already a valid heap
+        hard = np.flatnonzero(answered >= HARDEST_MIN_ANSWERS)
+        accuracy = correct[hard] / answered[hard]
+        order = np.lexsort((ids[hard], -attempts[hard], accuracy))
+        self.heap = list(zip(accuracy[order].tolist(), (-attempts[hard][order]).tolist(), ids[hard][order].tolist()))
+        self.current = {entry[2]: entry for entry in self.heap}
+
+    # --- Updates ---
+    def record(self, list_name, card, before):
+        # `before` is card_totals() of the card's stats just before the answer was applied
+        with self.lock:
+            after = card_totals(card["stats"])
+            agg = self.lists.setdefault(list_name, [0, 0, 0, 0, 0])
+            agg[1] += (after[0] > 0) - (before[0] > 0)
+            for i in range(3):
+                agg[2 + i] += after[i] - before[i]
+            self.cards[card["id"]] = (list_name, card, after)
+            self._push(card["id"], after)
+
+    def add(self, list_name, card):
+        with self.lock:
+            self._add(list_name, card)
+
+    def remove(self, card):
+        with self.lock:
+            self._remove(card["id"])
+
+    def remove_list(self, list_name):
+        with self.lock:
+            for card_id in [cid for cid, (name, _, _) in self.cards.items() if name == list_name]:
+                self._remove(card_id)
+            self.lists.pop(list_name, None)
+
+    # --- Registry Events (edits leave the stats alone) ---
+    def card_added(self, list_name, card):
+        self.add(list_name, card)
+
+    def card_removed(self, list_name, card):
+        self.remove(card)
+
+    def list_removed(self, list_name):
+        self.remove_list(list_name)
+
+    def _add(self, list_name, card):
+        totals = card_totals(card.get("stats", {}))
+        agg = self.lists.setdefault(list_name, [0, 0, 0, 0, 0])
+        agg[0] += 1
+        agg[1] += totals[0] > 0
+        for i in range(3):
+            agg[2 + i] += totals[i]
+        self.cards[card["id"]] = (list_name, card, totals)
+        self._push(card["id"], totals)
+
+    def _remove(self, card_id):
+        entry = self.cards.pop(card_id, None)
+        if entry is None:
+            return
+        list_name, _, totals = entry
+        agg = self.lists[list_name]
+        agg[0] -= 1
+        agg[1] -= totals[0] > 0
+        for i in range(3):
+            agg[2 + i] -= totals[i]
+        self.current.pop(card_id, None)
+
+    def _push(self, card_id, totals):
+        entry = hardness_key(card_id, totals)
+        if entry is None:
+            self.current.pop(card_id, None)
+            return
+        self.current[card_id] = entry
+        heapq.heappush(self.heap, entry)
+        if len(self.heap) > 2 * len(self.current) + 64:
+            # Mostly stale entries: rebuild from the live ones
+            self.heap = list(self.current.values())
+            heapq.heapify(self.heap)
+
+    # --- Queries ---
+    def list_summary(self, list_name):
+        cards, studied, attempts, correct, answered = self.lists.get(list_name, (0, 0, 0, 0, 0))
+        return {
+            "cards": cards,
+            "studied": studied,
+            "attempts": attempts,
+            "accuracy": correct / answered if answered else None,
+        }
+
+    def totals(self):
+        with self.lock:
+            sums = [sum(column) for column in zip(*self.lists.values())] or [0] * 5
+        cards, studied, attempts, correct, answered = sums
+        return {
+            "cards": cards,
+            "studied": studied,
+            "attempts": attempts,
+            "accuracy": correct / answered if answered else None,
+        }
+
+    def hardest(self, k=HARDEST_LIMIT):
+        # Up to k (list name, card, accuracy) hardest first: pops k live entries
+        # (dropping stale ones for good) and pushes them back
+        with self.lock:
+            live = []
+            while self.heap and len(live) < k:
+                entry = heapq.heappop(self.heap)
+                if self.current.get(entry[2]) is entry:
+                    live.append(entry)
+            for entry in live:
+                heapq.heappush(self.heap, entry)
+            return [(self.cards[card_id][0], self.cards[card_id][1], accuracy) for accuracy, _, card_id in live]
+
+
+def popcount(values):
+    if hasattr(np, "bitwise_count"): # NumPy 2.0+
+        return np.bitwise_count(values).astype(np.int64)
+    as_bytes = values.astype("<u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.int64)
+
+
+# --- Per-Deck Analytics (shared by every session holding the deck) ---
+def get_analytics(username, deck_data, build=True):
+    return registry.get_index(deck_data, "analytics", DeckAnalytics.build if build else None)
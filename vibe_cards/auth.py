@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+from .trace import traced
+
+# --- Constants & Config ---
+ALGORITHM = "pbkdf2_sha256"
+# Cost of every login. Raising it upgrades each account's hash at its next login;
+# `python -m vibe_cards.auth` measures what a given count costs on this machine.
+ITERATIONS = int(os.environ.get("VIBE_CARDS_PBKDF2_ITERATIONS", "600000"))
+SALT_BYTES = 16
+
+
+# --- Password Hashes ---
+# Stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>" (base64). Accounts created by
+# older versions hold the plain password until they next log in.
+def hash_password(password, iterations=None):
+    iterations = ITERATIONS if iterations is None else iterations
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _pbkdf2(password, salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+@traced("auth.verify")
+def verify_password(stored, password):
+    # `stored` is None for unknown users: still pay for a hash, so a login attempt
+    # takes as long whether or not the account exists
+    if stored is None:
+        hmac.compare_digest(_pbkdf2(password, b"\0" * SALT_BYTES, ITERATIONS), b"\0" * 32)
+        return False
+    parsed = parse_hash(stored)
+    if parsed is None:
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    iterations, salt, digest = parsed
+    return hmac.compare_digest(_pbkdf2(password, salt, iterations), digest)
+
+def needs_rehash(stored):
+    # Plain (pre-hashing) passwords and hashes made with another iteration count
+    parsed = parse_hash(stored)
+    return parsed is None or parsed[0] != ITERATIONS
+
+def parse_hash(stored):
+    # (iterations, salt, digest), or None if `stored` isn't one of our hashes
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != ALGORITHM or not parts[1].isdigit():
+        return None
+    return int(parts[1]), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+def _b64encode(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+# --- Cost Measurement ---
+def verify_seconds(iterations=None, repeat=5):
+    # Best-of-`repeat` time of one successful check
+    stored = hash_password("correct horse", iterations)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        verify_password(stored, "correct horse")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m vibe_cards.auth", description="Measure the cost of a login")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Suggest an iteration count for this verify time")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seconds = verify_seconds(args.iterations, args.repeat)
+    print(f"{ALGORITHM}, {args.iterations:,} iterations: {seconds * 1e3:.1f} ms per verify (one core)")
+    suggested = int(args.iterations * args.target_ms / 1e3 / seconds) // 1000 * 1000
+    print(f"~{args.target_ms:.0f} ms per verify: VIBE_CARDS_PBKDF2_ITERATIONS={suggested}")
@@ -0,0 +1,127 @@
+import threading
+from functools import partial
+
+from . import registry
+from .card_stats import card_tally
+from .trace import span
+
+
+# --- Id Repair ---
+def repair_card_ids(deck_data):
+    # Gives every card a unique integer id, keeping the first holder of each id.
+    # Returns how many cards were renumbered (older decks shipped duplicates).
+    next_id = max(
+        (card["id"] for lst in deck_data.values() for card in lst if isinstance(card.get("id"), int)),
+        default=0,
+    ) + 1
+    seen = set()
+    repaired = 0
+    for lst in deck_data.values():
+        for card in lst:
+            card_id = card.get("id")
+            if not isinstance(card_id, int) or card_id in seen:
+                card["id"] = card_id = next_id
+                next_id += 1
+                repaired += 1
+            seen.add(card_id)
+    return repaired
+
+
+# --- Id -> (list, position) Index ---
+class CardIndex:
+    # All lookups by card id are O(1); new ids come from the deck's monotonic counter.
+    # Lists are indexed as the deck loads them, so lists nobody opened are never read.
+    # Cards are added, deleted and edited through it; each change is noted on the deck
+    # (so SQLite writes only those rows) and passed to `notify(event, list name, *args)`
+    # (the registry, for the deck's other indexes).
+
+    def __init__(self, deck_data, notify=None):
+        self.deck_data = deck_data
+        self.where = {} # card id -> (list name, position)
+        self.indexed = set() # Lists whose cards are in `where`
+        self.lock = threading.Lock()
+        self.notify = notify or (lambda event, list_name, *args: None)
+
+    def _index_loaded(self):
+        for list_name, lst in self.deck_data.loaded_items():
+            if list_name not in self.indexed:
+                self.indexed.add(list_name)
+                for pos, card in enumerate(lst):
+                    self.where[card["id"]] = (list_name, pos)
+
+    def allocate_id(self):
+        return self.deck_data.allocate_id()
+
+    def locate(self, card_id):
+        where = self.where.get(card_id)
+        if where is None:
+            with self.lock:
+                self._index_loaded()
+            where = self.where[card_id]
+        return where
+
+    def card(self, card_id):
+        list_name, pos = self.locate(card_id)
+        return self.deck_data[list_name][pos]
+
+    def add(self, list_name, card):
+        if "id" not in card:
+            card["id"] = self.allocate_id()
+        lst = self.deck_data[list_name]
+        with self.lock:
+            self._index_loaded()
+            lst.append(card)
+            self.where[card["id"]] = (list_name, len(lst) - 1)
+        self.deck_data.note_card_change(list_name, card["id"], None, card)
+        self.notify("card_added", list_name, card)
+        return card
+
+    def delete(self, card_ids):
+        # Returns the removed cards, as (list name, card). Only the part of each list
+        # after the first removed card needs renumbering.
+        removed = []
+        with self.lock:
+            self._index_loaded()
+            by_list = {}
+            for card_id in card_ids:
+                if card_id in self.where:
+                    list_name, pos = self.where.pop(card_id)
+                    by_list.setdefault(list_name, []).append(pos)
+            for list_name, positions in by_list.items():
+                lst = self.deck_data[list_name]
+                drop = set(positions)
+                first = min(positions)
+                removed.extend((list_name, lst[pos]) for pos in sorted(positions))
+                lst[first:] = [card for pos, card in enumerate(lst[first:], first) if pos not in drop]
+                for pos in range(first, len(lst)):
+                    self.where[lst[pos]["id"]] = (list_name, pos)
+        for list_name, card in removed:
+            self.deck_data.note_card_change(list_name, card["id"], card_tally(card))
+            self.notify("card_removed", list_name, card)
+        return removed
+
+    def edit(self, card_id, changes):
+        # Returns the name of the card's list
+        list_name, pos = self.locate(card_id)
+        card = self.deck_data[list_name][pos]
+        counted = card_tally(card)
+        card.update(changes)
+        self.deck_data.note_card_change(list_name, card_id, counted, card)
+        self.notify("card_edited", list_name, card)
+        return list_name
+
+    def delete_list(self, list_name):
+        with self.lock:
+            if self.deck_data.is_loaded(list_name):
+                for card in self.deck_data[list_name]:
+                    self.where.pop(card["id"], None)
+            self.indexed.discard(list_name)
+            self.deck_data.pop(list_name, None)
+        self.notify("list_removed", list_name)
+
+
+def get_card_index(username, deck_data):
+    def build(deck):
+        with span("card_index.build", user=username):
+            return CardIndex(deck, partial(registry.notify, deck))
+    return registry.get_index(deck_data, "cards", build)
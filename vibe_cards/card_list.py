@@ -0,0 +1,30 @@
+import heapq
+
+from .card_stats import recent_accuracy
+
+# --- Constants & Config ---
+CARD_SORTS = ["Position", "Accuracy (lowest first)", "Attempts (most first)"]
+
+
+# --- Filter, Sort & Page One List ---
+def card_sort_key(sort_by):
+    if sort_by == "Accuracy (lowest first)":
+        def key(card):
+            acc = recent_accuracy(card.get("stats", {}))
+            return 2.0 if acc is None else acc # Never answered sorts last
+        return key
+    return lambda card: -card.get("stats", {}).get("attempts", 0)
+
+def matching_cards(deck, query):
+    if not query:
+        return range(len(deck)) # Lazy: nothing is built for the unfiltered view
+    return [i for i, card in enumerate(deck) if query in card["front"].lower() or query in card["back"].lower()]
+
+def page_of_cards(deck, positions, sort_by, page, page_size):
+    # Positions of the cards on one editor page; only that page is ever materialized
+    end = page * page_size
+    if sort_by != "Position":
+        # Partial sort: only the first `end` cards in this order are needed
+        key = card_sort_key(sort_by)
+        positions = heapq.nsmallest(end, positions, key=lambda i: key(deck[i]))
+    return positions[end - page_size:end]
@@ -0,0 +1,57 @@
+from .scheduler import card_due, schedule_review
+
+# --- Constants & Config ---
+HISTORY_SIZE = 20 # Answers kept per card
+HISTORY_MASK = (1 << HISTORY_SIZE) - 1
+
+
+# --- Compact Review History ---
+# card["stats"] keeps the last HISTORY_SIZE answers as an integer bitfield instead of a
+# list of booleans: bit 0 of "hist" is the most recent answer (1 = correct) and
+# "hist_len" says how many bits are in use. In memory that is one small int per card
+# instead of a 20-slot list, and on disk "hist": 37 instead of "[true, false, ...]".
+def new_stats():
+    return {"attempts": 0, "hist": 0, "hist_len": 0}
+
+def upgrade_stats(stats):
+    # Accepts missing stats and the old {"history": [bool, ...]} format (oldest first)
+    if stats is None:
+        return new_stats()
+    if "history" in stats:
+        history = stats.pop("history")[-HISTORY_SIZE:]
+        bits = 0
+        for ok in history:
+            bits = (bits << 1) | bool(ok)
+        stats["hist"] = bits
+        stats["hist_len"] = len(history)
+    stats.setdefault("attempts", 0)
+    stats.setdefault("hist", 0)
+    stats.setdefault("hist_len", 0)
+    return stats
+
+def push_history(stats, is_correct):
+    stats["hist"] = ((stats["hist"] << 1) | bool(is_correct)) & HISTORY_MASK
+    stats["hist_len"] = min(stats["hist_len"] + 1, HISTORY_SIZE)
+
+def recent_correct(stats, last=HISTORY_SIZE):
+    # Correct answers among the `last` most recent ones: a mask and a popcount
+    n = min(last, stats.get("hist_len", 0))
+    return (stats.get("hist", 0) & ((1 << n) - 1)).bit_count()
+
+def recent_accuracy(stats, last=HISTORY_SIZE):
+    # Share of correct answers in the kept history, None if never answered
+    n = min(last, stats.get("hist_len", 0))
+    return recent_correct(stats, n) / n if n else None
+
+def card_tally(card):
+    # What a card counts for in its list's summary: (due date, recent right answers, recent answers)
+    stats = card.get("stats", {})
+    return card_due(card), recent_correct(stats), min(stats.get("hist_len", 0), HISTORY_SIZE)
+
+
+# --- Answer Recording ---
+def apply_review(card, is_correct, now=None):
+    stats = card["stats"] = upgrade_stats(card.get("stats"))
+    stats["attempts"] += 1
+    push_history(stats, is_correct)
+    schedule_review(stats, is_correct, now)
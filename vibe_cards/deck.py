@@ -0,0 +1,269 @@
+import threading
+import time
+from collections.abc import MutableMapping
+
+from .card_index import repair_card_ids
+from .card_stats import card_tally, upgrade_stats
+
+# --- Schema ---
+# Version of the stored card format. A list stored at this version holds complete
+# cards (every key of a new card, stats in the bitfield format, deck-unique ids) and
+# is used as read; an older one is upgraded once, when first loaded, and written back.
+# Lists written before versions were recorded count as 1.
+SCHEMA_VERSION = 2
+
+
+def upgrade_card(card):
+    card.setdefault("enable_write", False)
+    card.setdefault("enable_choice", False)
+    card.setdefault("distractors", [])
+    card["stats"] = upgrade_stats(card.get("stats"))
+    return card
+
+
+def list_tally(cards, now=None):
+    # What the Library shows about a list: card count, cards due at `now`, next due date;
+    # plus the share of right answers in its cards' recent history (None if never answered).
+    # Returned with the [right, total] recent answers that share is made of.
+    now = time.time() if now is None else now
+    due = 0
+    next_due = None
+    correct = answered = 0
+    for card in cards:
+        when, card_correct, card_answered = card_tally(card)
+        if when <= now:
+            due += 1
+        elif next_due is None or when < next_due:
+            next_due = when
+        correct += card_correct
+        answered += card_answered
+    summary = {"cards": len(cards), "due": due, "next_due": next_due, "accuracy": correct / answered if answered else None}
+    return summary, [correct, answered]
+
+
+# --- Lazily Loaded Deck ---
+class LazyDeck(MutableMapping):
+    # list name -> cards, like the plain dict it replaces, but a list is only read from
+    # storage the first time it's used. The manifest holds what the Library needs about
+    # every list (cards, due, next_due, accuracy, last_studied, plus backend keys such as
+    # the file name) so the dashboard never touches the cards themselves.
+
+    def __init__(self, owner, manifest, load_list, next_id=1, on_upgrade=None, on_load=None):
+        self.owner = owner # The storage that wrote the manifest; other backends save it in full
+        self.manifest = manifest # list name -> entry, in list order
+        self._load_list = load_list # (name, entry) -> cards
+        self._on_upgrade = on_upgrade # (name) -> None, once a list older than SCHEMA_VERSION is upgraded
+        self._on_load = on_load # (name) -> None, after a list is loaded (not for read())
+        self.lists = {} # Loaded lists only
+        self.dirty = set() # Loaded lists whose cards changed since the last write
+        self.stale = set() # Loaded lists whose manifest entry needs recomputing
+        self.tallies = {} # Loaded list -> [right, total] recent answers, as of its manifest entry
+        self.edited = set() # Dirty lists whose cards were added, removed or edited, not just answered
+        self.card_changes = {} # Edited list -> ids of the only cards added, edited or deleted (else: rewritten whole)
+        self.removed = [] # Entries of deleted lists, until the next write drops them
+        self.next_id = next_id
+        self.synced = None # The backend's marker of the stored state this deck reflects (None: unknown)
+        self.indexes = {} # Built over this deck and kept with it, by the registry
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_dict(cls, owner, deck_dict):
+        # Every list loaded and dirty: the next write stores all of it
+        repair_card_ids(deck_dict)
+        deck = cls(owner, {}, None)
+        for name, cards in deck_dict.items():
+            for card in cards:
+                upgrade_card(card)
+            deck.manifest[name] = {"last_studied": None}
+            deck.lists[name] = cards
+            deck.touch(name)
+        deck.next_id = max((c["id"] for cards in deck.lists.values() for c in cards), default=0) + 1
+        return deck
+
+    def __getitem__(self, name):
+        cards = self.lists.get(name)
+        if cards is not None:
+            return cards
+        with self.lock:
+            if name not in self.lists:
+                entry = self.manifest[name] # KeyError for unknown lists, as with a dict
+                cards = self._load_list(name, entry)
+                self.lists[name] = cards
+                self.stale.add(name)
+                if entry.get("version", 1) < SCHEMA_VERSION:
+                    for card in cards:
+                        upgrade_card(card)
+                    self._repair_ids(cards)
+                    self.dirty.add(name) # Written back at the current version
+                    if self._on_upgrade is not None:
+                        self._on_upgrade(name)
+                if self._on_load is not None:
+                    self._on_load(name)
+            return self.lists[name]
+
+    def __setitem__(self, name, cards):
+        with self.lock:
+            self.manifest.setdefault(name, {"last_studied": None})
+            self.lists[name] = cards
+            self.touch(name)
+            self.edited.add(name)
+            self.card_changes.pop(name, None)
+
+    def __delitem__(self, name):
+        with self.lock:
+            self.removed.append(self.manifest.pop(name))
+            self.lists.pop(name, None)
+            self.dirty.discard(name)
+            self.stale.discard(name)
+            self.edited.discard(name)
+            self.card_changes.pop(name, None)
+            self.tallies.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.manifest
+
+    def __iter__(self):
+        return iter(list(self.manifest))
+
+    def __len__(self):
+        return len(self.manifest)
+
+    def is_loaded(self, name):
+        return name in self.lists
+
+    def loaded_items(self):
+        with self.lock:
+            return list(self.lists.items())
+
+    def read(self, name):
+        # A list's cards without keeping them loaded: one pass over a deck bigger than memory
+        cards = self.lists.get(name)
+        if cards is not None:
+            return cards
+        entry = self.manifest[name]
+        cards = self._load_list(name, entry)
+        if entry.get("version", 1) < SCHEMA_VERSION:
+            for card in cards:
+                upgrade_card(card)
+        return cards
+
+    def load_all(self):
+        for name in self:
+            self[name]
+        return self
+
+    def allocate_id(self):
+        with self.lock:
+            card_id = self.next_id
+            self.next_id += 1
+            return card_id
+
+    def _repair_ids(self, cards):
+        # Ids are unique deck-wide because they all come from next_id; a list written by
+        # an older version can still hold cards without one, or duplicates
+        seen = set()
+        repaired = 0
+        for card in cards:
+            card_id = card.get("id")
+            if isinstance(card_id, int) and card_id not in seen:
+                self.next_id = max(self.next_id, card_id + 1)
+            else:
+                card["id"] = card_id = self.allocate_id()
+                repaired += 1
+            seen.add(card_id)
+        return repaired
+
+    # --- Change Tracking ---
+    def touch(self, name):
+        # The cards of a loaded list changed (added, removed, edited or answered)
+        with self.lock:
+            self.dirty.add(name)
+            self.stale.add(name)
+
+    def note_card_change(self, name, card_id, counted=None, card=None):
+        # One card of a loaded list was added (`counted` None), deleted (`card` None) or
+        # edited, by CardIndex; `counted` is its card_tally before. A backend that stores
+        # cards as rows writes just those, unless the list is already due to be written
+        # whole; the manifest entry follows like with note_answer.
+        with self.lock:
+            if name in self.card_changes:
+                self.card_changes[name].add(card_id)
+            elif name not in self.dirty:
+                self.card_changes[name] = {card_id}
+            self.dirty.add(name)
+            self.edited.add(name)
+            self._retally(name, counted, card, time.time())
+
+    def note_review(self, name, now):
+        # The cards themselves changed too: touch() or note_answer() the list as well
+        with self.lock:
+            entry = self.manifest[name]
+            entry["last_studied"] = max(entry.get("last_studied") or 0, now) # Offline answers may arrive late
+
+    def note_answer(self, name, counted, card, now):
+        # Brings a loaded list's manifest entry up to date with one answered card without
+        # going over the list: `counted` is the card_tally the entry was computed with.
+        # Only while no other card came due since the entry was; else it's recomputed.
+        with self.lock:
+            self._retally(name, counted, card, now)
+
+    def _retally(self, name, counted, card, now):
+        entry = self.manifest[name]
+        tally = self.tallies.get(name)
+        next_due = entry.get("next_due")
+        if tally is None or name in self.stale or (next_due is not None and next_due <= now):
+            self.stale.add(name)
+            return
+        for sign, counts in ((-1, counted), (1, None if card is None else card_tally(card))):
+            if counts is None:
+                continue
+            when, correct, answered = counts
+            entry["cards"] += sign
+            if when <= now:
+                entry["due"] += sign
+            elif sign > 0 and (next_due is None or when < next_due):
+                entry["next_due"] = when # If it was this card's old date, too early is only a recompute then
+            tally[0] += sign * correct
+            tally[1] += sign * answered
+        entry["accuracy"] = tally[0] / tally[1] if tally[1] else None
+
+    def summary(self, name, now=None):
+        # Manifest entry of a list, exact for loaded lists. For a list that isn't loaded,
+        # "due" is as of its last write and "next_due" tells whether more are due since.
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.manifest[name]
+            next_due = entry.get("next_due")
+            if name in self.lists and (name in self.stale or (next_due is not None and next_due <= now)):
+                summary, self.tallies[name] = list_tally(self.lists[name], now)
+                entry.update(summary)
+                self.stale.discard(name)
+            return entry
+
+    def take_changes(self):
+        # (dirty lists with their cards, removed entries, edited list names, card changes)
+        # for a write; put back on failure. Loaded lists are always current, so whatever
+        # gets written is too.
+        with self.lock:
+            dirty = {name: self.lists[name] for name in self.dirty}
+            for name in dirty:
+                self.manifest[name]["version"] = SCHEMA_VERSION
+            changes = (dirty, self.removed, self.edited, self.card_changes)
+            self.dirty = set()
+            self.removed = []
+            self.edited = set()
+            self.card_changes = {}
+            return changes
+
+    def restore_changes(self, dirty, removed, edited, card_changes):
+        with self.lock:
+            for name in dirty:
+                if name not in card_changes:
+                    self.card_changes.pop(name, None) # Still to be written whole
+                elif name in self.card_changes:
+                    self.card_changes[name].update(card_changes[name])
+                elif name in self.manifest and name not in self.dirty:
+                    self.card_changes[name] = card_changes[name]
+            self.dirty.update(name for name in dirty if name in self.manifest)
+            self.edited.update(name for name in edited if name in self.manifest)
+            self.removed = removed + self.removed
@@ -0,0 +1,156 @@
+import heapq
+import threading
+from itertools import islice
+
+from . import registry
+from .grading import normalize_answer, fold_accents
+from .trace import span, traced
+
+# --- Constants & Config ---
+NGRAM_SIZE = 3
+CHOICE_DISTRACTORS = 3 # Wrong options shown next to the right one
+COMMON_NGRAM_SHARE = 0.1 # n-grams in more than this share of a big list's answers are skipped when scoring
+COMMON_NGRAM_MIN_ANSWERS = 50
+
+
+def answer_key(text):
+    # Answers that grade as the same answer are one option
+    return fold_accents(normalize_answer(text))
+
+def char_ngrams(key, n=NGRAM_SIZE):
+    # Padded, so short answers and word boundaries still produce n-grams
+    padded = f" {key} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+# --- Per-List Answer Index ---
+class DistractorIndex:
+    # Character n-gram index over the distinct `back` values of one list. The wrong
+    # options for a card are the answers sharing the most n-grams with its own answer
+    # (Dice similarity): same script, similar spelling and length, so plausible.
+    # Cards are added and removed one at a time as the editor changes the list; each
+    # card's options are computed on first use and kept until the answers change.
+
+    def __init__(self):
+        self.answers = {} # answer key -> [back as first written, n-grams, number of cards]
+        self.postings = {} # n-gram -> {answer key}
+        self.key_of = {} # card id -> answer key
+        self.cached = {} # answer key -> nearest other answers, in order
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, cards):
+        index = cls()
+        for card in cards:
+            index._add(card)
+        return index
+
+    def add(self, card):
+        with self.lock:
+            self._add(card)
+
+    def remove(self, card):
+        with self.lock:
+            self._remove(card["id"])
+
+    def update(self, card):
+        # The card's answer may have been edited
+        with self.lock:
+            self._remove(card["id"])
+            self._add(card)
+
+    # --- Registry Events (one list's index: only that list's cards) ---
+    def card_added(self, list_name, card):
+        self.add(card)
+
+    def card_removed(self, list_name, card):
+        self.remove(card)
+
+    def card_edited(self, list_name, card):
+        self.update(card)
+
+    def _add(self, card):
+        key = answer_key(card.get("back", ""))
+        if not key:
+            return
+        self.key_of[card["id"]] = key
+        entry = self.answers.get(key)
+        if entry is not None:
+            entry[2] += 1
+            return
+        grams = char_ngrams(key)
+        self.answers[key] = [card["back"], grams, 1]
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(key)
+        self.cached.clear() # A new answer can be anyone's nearest
+
+    def _remove(self, card_id):
+        key = self.key_of.pop(card_id, None)
+        if key is None:
+            return
+        entry = self.answers[key]
+        entry[2] -= 1
+        if entry[2]:
+            return
+        del self.answers[key]
+        for gram in entry[1]:
+            posting = self.postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self.postings[gram]
+        self.cached.clear()
+
+    @traced("distractors")
+    def distractors(self, card, k=CHOICE_DISTRACTORS):
+        # Up to k wrong answers for `card`, most similar first
+        key = answer_key(card.get("back", ""))
+        with self.lock:
+            nearest = self.cached.get(key)
+            if nearest is None:
+                nearest = self.cached[key] = self._nearest(key)
+            return nearest[:k]
+
+    def _nearest(self, key, keep=CHOICE_DISTRACTORS * 2):
+        grams = self.answers[key][1] if key in self.answers else char_ngrams(key)
+        common = max(COMMON_NGRAM_MIN_ANSWERS, len(self.answers) * COMMON_NGRAM_SHARE)
+        shared = {}
+        for gram in grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) > common:
+                continue # e.g. " le" in a French list: says nothing about similarity
+            for other in posting:
+                shared[other] = shared.get(other, 0) + 1
+        shared.pop(key, None)
+        scored = heapq.nsmallest(
+            keep, shared,
+            key=lambda other: (-2 * shared[other] / (len(grams) + len(self.answers[other][1])), other),
+        )
+        if len(scored) < keep:
+            # Too little overlap in a small or varied list: fill up with any other answers
+            scored += islice((other for other in self.answers if other != key and other not in shared), keep - len(scored))
+        return [self.answers[other][0] for other in scored[:keep]]
+
+
+def choice_options(card, index, k=CHOICE_DISTRACTORS):
+    # Every hand-written distractor is shown; generated ones top them up to k. None
+    # when there's no wrong answer to offer (a one-answer list).
+    wrong = list(card.get("distractors", []))
+    if len(wrong) < k and index is not None:
+        taken = {answer_key(card["back"])} | {answer_key(option) for option in wrong}
+        for option in index.distractors(card, k + len(wrong)):
+            if answer_key(option) not in taken:
+                wrong.append(option)
+                taken.add(answer_key(option))
+                if len(wrong) == k:
+                    break
+    return wrong + [card["back"]] if wrong else None
+
+
+# --- Per-Deck Indexes (one per list, built when the list is first studied) ---
+def get_distractor_index(username, deck_data, list_name, build=True):
+    def build_index(deck):
+        with span("distractors.build", list=list_name):
+            return DistractorIndex.build(deck[list_name])
+    return registry.get_index(deck_data, ("distractors", list_name), build_index if build else None)
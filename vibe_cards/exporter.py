@@ -0,0 +1,184 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from .storage import get_storage, atomic_write_json, read_json
+
+# --- Constants & Config ---
+FORMATS = {"csv": ".csv", "jsonl": ".jsonl", "zip": ".zip"}
+# Readable back by the importer: front, back, distractors (separated by |) and the two flags
+CSV_COLUMNS = ["user", "list", "id", "front", "back", "distractors", "enable_write", "enable_choice", "attempts", "due"]
+SPOOL_MAX_BYTES = 8 * 1024 * 1024 # Exports for download stay in memory up to this size, then spill to disk
+BACKUP_STATE_FILE = "backup_state.json"
+ARCHIVE_VERSION = 1
+
+
+# --- Rows (one list in memory at a time) ---
+def iter_deck_rows(username, deck, list_names=None):
+    # (username, list name, card) for the given lists (default: all), in deck order.
+    # Lists that aren't loaded are read and let go again, so memory stays bounded by
+    # the biggest list, not the deck.
+    for list_name in (list(deck) if list_names is None else [n for n in list_names if n in deck]):
+        for card in deck.read(list_name):
+            yield username, list_name, card
+
+def iter_storage_rows(storage, usernames, list_names=None):
+    for username in usernames:
+        yield from iter_deck_rows(username, storage.read_deck(username), list_names)
+
+def card_record(username, list_name, card):
+    return dict(card, user=username, list=list_name)
+
+
+# --- Writers ---
+def write_csv(rows, stream):
+    # `stream` is a text stream opened with newline=""
+    writer = csv.writer(stream)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for username, list_name, card in rows:
+        stats = card.get("stats", {})
+        writer.writerow([
+            username, list_name, card.get("id"), card.get("front", ""), card.get("back", ""),
+            "|".join(card.get("distractors", [])), int(bool(card.get("enable_write"))),
+            int(bool(card.get("enable_choice"))), stats.get("attempts", 0), stats.get("due", ""),
+        ])
+        count += 1
+    return count
+
+def write_jsonl(rows, stream):
+    count = 0
+    for username, list_name, card in rows:
+        stream.write(json.dumps(card_record(username, list_name, card), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def write_archive(storage, usernames, binary_stream, decks=None, with_accounts=False):
+    # A zip with, per user, cards.jsonl (every card with its stats) and reviews.jsonl
+    # (every answer given, oldest first), plus export.json describing
+    # the archive. Every member is streamed into the zip, none is built in memory.
+    # `decks` maps usernames to decks already loaded (e.g. a session's own); the others
+    # are read without writing anything back.
+    decks = decks or {}
+    summary = {"version": ARCHIVE_VERSION, "exported_at": time.time(), "users": {}}
+    with zipfile.ZipFile(binary_stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for username in usernames:
+            deck = decks[username] if username in decks else storage.read_deck(username)
+            with archive.open(f"{username}/cards.jsonl", "w", force_zip64=True) as member:
+                with io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                    cards = write_jsonl(iter_deck_rows(username, deck), text)
+            with archive.open(f"{username}/reviews.jsonl", "w", force_zip64=True) as member:
+                with io.TextIOWrapper(member, encoding="utf-8", newline="") as text:
+                    reviews = 0
+                    for review in storage.iter_reviews(username):
+                        text.write(json.dumps(review) + "\n")
+                        reviews += 1
+            if with_accounts:
+                # Restoring needs the password hash; only server-side backups carry it
+                archive.writestr(f"{username}/account.json", json.dumps({
+                    "username": username, "password": storage.get_password(username),
+                }))
+            summary["users"][username] = {"lists": len(deck), "cards": cards, "reviews": reviews}
+        archive.writestr("export.json", json.dumps(summary, indent=2))
+    return summary
+
+
+# --- Entry Points ---
+def export_deck(username, deck, fmt, list_names=None, storage=None):
+    # One user's deck (or some of its lists) as a binary file object positioned at the
+    # start, for a download button. Spills to a temporary file once it gets big.
+    storage = storage or get_storage()
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    if fmt == "zip":
+        write_archive(storage, [username], out, decks={username: deck})
+    else:
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        (write_csv if fmt == "csv" else write_jsonl)(iter_deck_rows(username, deck, list_names), text)
+        text.flush()
+        text.detach() # Keep `out` open for the caller
+    out.seek(0)
+    return out
+
+def export_to_path(path, fmt, usernames, list_names=None, storage=None):
+    # Users' cards straight into a file (stdout for "-"). Returns the number of cards;
+    # a zip always holds whole users.
+    storage = storage or get_storage()
+    if fmt == "zip":
+        with open(path, "wb") as f:
+            summary = write_archive(storage, usernames, f)
+        return sum(user["cards"] for user in summary["users"].values())
+    write = write_csv if fmt == "csv" else write_jsonl
+    if path == "-":
+        return write(iter_storage_rows(storage, usernames, list_names), sys.stdout)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        return write(iter_storage_rows(storage, usernames, list_names), f)
+
+def backup_fingerprint(storage, username):
+    return hashlib.sha1(json.dumps(
+        [storage.change_stamp(username), storage.get_password(username)]
+    ).encode("utf-8")).hexdigest()
+
+def backup(dest, storage=None, full=False, log=print):
+    # One zip per user in `dest` (accounts included), rewritten only for users whose
+    # data changed since the previous run; full=True rewrites all of them.
+    storage = storage or get_storage()
+    os.makedirs(dest, exist_ok=True)
+    state_path = os.path.join(dest, BACKUP_STATE_FILE)
+    state = {}
+    if os.path.exists(state_path) and not full:
+        state = read_json(state_path)
+    written = []
+    for username in storage.list_usernames():
+        fingerprint = backup_fingerprint(storage, username)
+        if state.get(username) == fingerprint:
+            continue
+        # Hashed file name: usernames may hold characters a file name can't
+        path = os.path.join(dest, f"{hashlib.sha1(username.encode('utf-8')).hexdigest()[:16]}.zip")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            summary = write_archive(storage, [username], f, with_accounts=True)
+        os.replace(tmp_path, path)
+        # Recorded only if nothing was written while the archive was read: otherwise
+        # the next run archives the user again
+        if backup_fingerprint(storage, username) == fingerprint:
+            state[username] = fingerprint
+        atomic_write_json(state_path, state) # After each user: an interrupted run resumes where it stopped
+        written.append(username)
+        log(f"{username}: {summary['users'][username]['cards']} cards -> {os.path.basename(path)}")
+    return written
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m vibe_cards.exporter", description="Export and back up decks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write users' cards to a CSV, JSONL or zip file")
+    export.add_argument("output", help="File to write, or - for stdout (csv/jsonl)")
+    export.add_argument("--user", action="append", help="Export only this user (repeatable; default: everyone)")
+    export.add_argument("--list", action="append", help="Export only this list of each user (repeatable; csv/jsonl)")
+    export.add_argument("--format", choices=sorted(FORMATS), help="Default: from the output file extension")
+    back_up = sub.add_parser("backup", help="Write a zip per user whose data changed since the last backup")
+    back_up.add_argument("dest")
+    back_up.add_argument("--full", action="store_true", help="Rewrite every user's archive")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    if args.command == "export":
+        fmt = args.format or {ext: name for name, ext in FORMATS.items()}.get(os.path.splitext(args.output)[1].lower())
+        if fmt is None:
+            parser.error(f"can't tell the format of '{args.output}': pass --format")
+        if args.list and fmt == "zip":
+            parser.error("--list works with csv and jsonl; a zip holds whole users")
+        usernames = args.user or storage.list_usernames()
+        count = export_to_path(args.output, fmt, usernames, args.list, storage)
+        if args.output != "-":
+            print(f"Exported {count} cards of {len(usernames)} user(s) to {args.output}")
+    else:
+        written = backup(args.dest, storage, args.full)
+        print(f"Backed up {len(written)} changed user(s) to {args.dest}")
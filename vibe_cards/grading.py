@@ -0,0 +1,154 @@
+import re
+import unicodedata
+from collections import Counter
+
+from .trace import traced
+
+# --- Constants & Config ---
+PARTIAL_THRESHOLD = 0.7 # Similarity above this counts as "Close"
+COMBINING_MARKS = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+
+
+# --- Normalization ---
+def normalize_answer(text):
+    # Case, Unicode composition and whitespace never count as mistakes
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+def fold_accents(text):
+    # "élève" -> "eleve"; only applied to already normalized text
+    if text.isascii():
+        return text
+    return COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+
+
+# --- Edit Distance ---
+def bounded_distance(a, b, max_dist):
+    # Damerau (optimal string alignment) distance using Hyyrö's bit-parallel form of
+    # Myers' algorithm: one column of the DP matrix per character of `a`, held as bits
+    # of a Python int. Returns max_dist + 1 as soon as the answer can't get that close.
+    if len(a) - len(b) > max_dist or len(b) - len(a) > max_dist:
+        return max_dist + 1
+    if not b:
+        return len(a)
+    # Every character one string has and the other lacks needs at least one edit;
+    # only worth counting once the strings outgrow a machine word
+    if len(b) > 64:
+        counts_a, counts_b = Counter(a), Counter(b)
+        if max(sum((counts_a - counts_b).values()), sum((counts_b - counts_a).values())) > max_dist:
+            return max_dist + 1
+
+    full = (1 << len(b)) - 1
+    last = 1 << (len(b) - 1)
+    match_masks = {}
+    for i, ch in enumerate(b):
+        match_masks[ch] = match_masks.get(ch, 0) | (1 << i)
+
+    vp, vn, d0, prev_eq = full, 0, 0, 0
+    dist = len(b)
+    remaining = len(a)
+    for ch in a:
+        eq = match_masks.get(ch, 0)
+        transposed = (((~d0 & eq) << 1) & prev_eq)
+        d0 = (((eq & vp) + vp) ^ vp) | eq | vn | transposed
+        hp = vn | (~(d0 | vp) & full)
+        hn = d0 & vp
+        if hp & last:
+            dist += 1
+        elif hn & last:
+            dist -= 1
+        remaining -= 1
+        if dist - remaining > max_dist:
+            return max_dist + 1 # Even a perfect tail can't bring it back under the bound
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = hp & d0
+        prev_eq = eq
+    return dist if dist <= max_dist else max_dist + 1
+
+
+# --- Grading ---
+@traced("grade")
+def grade_answer(user_input, correct_answer):
+    # Returns "correct", "partial" or "missed"
+    return _grade_normalized(normalize_answer(user_input), normalize_answer(correct_answer))
+
+def _grade_normalized(a, b):
+    if a == b:
+        return "correct"
+    a = fold_accents(a)
+    b = fold_accents(b)
+    if a == b:
+        return "partial" # Right word, wrong accents
+    longest = max(len(a), len(b))
+    # Partial means similarity > threshold, i.e. distance strictly below this bound
+    max_dist = int(longest * (1 - PARTIAL_THRESHOLD) - 1e-9)
+    if bounded_distance(a, b, max_dist) <= max_dist:
+        return "partial"
+    return "missed"
+
+def grade_batch(pairs):
+    # Grades many (user_input, correct_answer) pairs; each distinct answer is
+    # normalized once, which is what dominates when a class answers the same card.
+    answers = {}
+    grades = []
+    for user_input, correct_answer in pairs:
+        b = answers.get(correct_answer)
+        if b is None:
+            b = answers[correct_answer] = normalize_answer(correct_answer)
+        grades.append(_grade_normalized(normalize_answer(user_input), b))
+    return grades
+
+
+# --- Benchmark: python -m vibe_cards.grading [--pairs N] [--length L] ---
+def _difflib_grade(user_input, correct_answer):
+    # The grader this module replaced, kept only for comparison
+    import difflib
+    sim = difflib.SequenceMatcher(None, user_input.lower().strip(), correct_answer.lower().strip()).ratio()
+    if sim == 1.0:
+        return "correct"
+    return "partial" if sim > PARTIAL_THRESHOLD else "missed"
+
+def _benchmark_pairs(count, length, seed=0):
+    import random
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyzéèàç "
+    pairs = []
+    for _ in range(count):
+        answer = "".join(rng.choice(letters) for _ in range(length)).strip() or "a"
+        kind = rng.random()
+        if kind < 0.3:
+            typed = answer.upper()
+        elif kind < 0.7:
+            typed = list(answer)
+            for _ in range(max(1, length // 10)):
+                typed[rng.randrange(len(typed))] = rng.choice(letters)
+            typed = "".join(typed)
+        else:
+            typed = "".join(rng.choice(letters) for _ in range(length))
+        pairs.append((typed, answer))
+    return pairs
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(prog="python -m vibe_cards.grading", description="Compare the grader against the old difflib path")
+    parser.add_argument("--pairs", type=int, default=5000)
+    parser.add_argument("--length", type=int, nargs="+", default=[10, 40, 200])
+    args = parser.parse_args()
+
+    for length in args.length:
+        pairs = _benchmark_pairs(args.pairs, length)
+        start = time.perf_counter()
+        old = [_difflib_grade(u, c) for u, c in pairs]
+        old_time = time.perf_counter() - start
+        start = time.perf_counter()
+        new = grade_batch(pairs)
+        new_time = time.perf_counter() - start
+        agree = sum(o == n for o, n in zip(old, new)) / len(pairs)
+        print(
+            f"length {length:>4}: difflib {old_time * 1e6 / len(pairs):8.1f} us/answer, "
+            f"grading {new_time * 1e6 / len(pairs):8.1f} us/answer "
+            f"({old_time / new_time:4.1f}x), same grade {agree:.0%}"
+        )
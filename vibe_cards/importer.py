@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+import os
+
+from .storage import get_storage
+from .card_stats import new_stats
+
+# --- Constants & Config ---
+IMPORT_BATCH_SIZE = 5000 # Cards per storage commit
+MAX_REPORTED_ERRORS = 20
+FORMATS = {".csv": "csv", ".tsv": "tsv", ".txt": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+TRUE_STRINGS = {"1", "true", "yes", "y", "x"}
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = [] # (line number, message), capped at MAX_REPORTED_ERRORS
+
+    def error(self, line_no, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def detect_format(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported file type '{ext}' (use {', '.join(sorted(FORMATS))})")
+    return FORMATS[ext]
+
+
+# --- Row Parsing (streaming, one line at a time) ---
+def iter_rows(stream, fmt):
+    # Yields (line number, row dict). CSV/TSV files may have a header naming their
+    # columns; without one the columns are front, back, then distractors.
+    if fmt == "jsonl":
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"invalid JSON: {e}")
+                continue
+            yield line_no, row if isinstance(row, dict) else ValueError("expected a JSON object")
+        return
+
+    reader = csv.reader(stream, delimiter="\t" if fmt == "tsv" else ",")
+    header = None
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if header is None:
+            names = [cell.strip().lower() for cell in row]
+            if "front" in names and "back" in names:
+                header = names
+                continue
+            header = ["front", "back"]
+        record = dict(zip(header, row))
+        if len(row) > len(header):
+            record["distractors"] = [record.get("distractors", "")] + row[len(header):]
+        yield reader.line_num, record
+
+def row_to_card(row, card_id):
+    front = str(row.get("front", "")).strip()
+    back = str(row.get("back", "")).strip()
+    if not front or not back:
+        raise ValueError("front and back are required")
+
+    distractors = row.get("distractors") or []
+    if isinstance(distractors, str):
+        distractors = distractors.split("|")
+    distractors = [str(d).strip() for d in distractors if str(d).strip()]
+
+    def flag(name):
+        value = row.get(name, False)
+        return value if isinstance(value, bool) else str(value).strip().lower() in TRUE_STRINGS
+
+    return {
+        "id": card_id,
+        "front": front,
+        "back": back,
+        "enable_write": flag("enable_write"),
+        "enable_choice": flag("enable_choice"), # Options are generated from the list when there are none
+        "distractors": distractors,
+        "stats": new_stats()
+    }
+
+def iter_card_batches(rows, first_id, report, batch_size=IMPORT_BATCH_SIZE):
+    next_id = first_id
+    batch = []
+    for line_no, row in rows:
+        if isinstance(row, Exception):
+            report.error(line_no, str(row))
+            continue
+        try:
+            card = row_to_card(row, next_id)
+        except ValueError as e:
+            report.error(line_no, str(e))
+            continue
+        next_id += 1
+        batch.append(card)
+        if len(batch) >= batch_size:
+            report.imported += len(batch)
+            yield batch
+            batch = []
+    if batch:
+        report.imported += len(batch)
+        yield batch
+
+
+# --- Entry Point ---
+def import_cards(username, list_name, stream, fmt, storage=None, batch_size=IMPORT_BATCH_SIZE):
+    # `stream` is a text stream opened with newline="" (see open_upload for binary ones)
+    storage = storage or get_storage()
+    report = ImportReport()
+    batches = iter_card_batches(iter_rows(stream, fmt), storage.next_card_id(username), report, batch_size)
+    storage.import_cards(username, list_name, batches)
+    return report
+
+def open_upload(binary_stream):
+    # utf-8-sig drops the BOM spreadsheet exports like to add
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m vibe_cards.importer", description="Bulk import cards into a user's deck")
+    parser.add_argument("username")
+    parser.add_argument("file")
+    parser.add_argument("--list", help="Target list (default: file name)")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    list_name = args.list or os.path.splitext(os.path.basename(args.file))[0]
+    with open(args.file, "r", encoding="utf-8-sig", newline="") as f:
+        report = import_cards(args.username, list_name, f, args.format or detect_format(args.file),
+                              batch_size=args.batch_size)
+    print(f"Imported {report.imported} cards into '{list_name}', skipped {report.skipped}")
+    for line_no, message in report.errors:
+        print(f"  line {line_no}: {message}")
@@ -0,0 +1,41 @@
+import threading
+
+# --- Per-Deck Indexes ---
+# Everything derived from a deck and kept between reruns (card index, search index,
+# analytics, due cards, a distractor index per list) is kept on the deck object it was
+# built from (LazyDeck.indexes): shared by the sessions holding that object, freed with
+# it once it leaves the deck cache and every session let go of it, and started over for
+# a reloaded deck. Card edits go through CardIndex, which notifies every index built so far, so no
+# caller has to know which indexes exist.
+_indexes_lock = threading.Lock()
+
+def get_index(deck_data, key, build=None):
+    # `key`: the kind of index, or (kind, list name) for one built over a single list.
+    # `build`: deck -> new index, called outside the lock; None only looks one up.
+    with _indexes_lock:
+        index = deck_data.indexes.get(key)
+        if index is not None or build is None:
+            return index
+    index = build(deck_data)
+    with _indexes_lock:
+        return deck_data.indexes.setdefault(key, index) # Another thread may have built one meanwhile
+
+def drop_indexes(deck_data):
+    # After a change made behind CardIndex's back (e.g. a bulk import)
+    with _indexes_lock:
+        deck_data.indexes.clear()
+
+def notify(deck_data, event, list_name, *args):
+    # Passes a change to `list_name` on to each index of the deck with a method named
+    # `event` (card_added, card_removed, card_edited, card_answered, list_removed); an
+    # index of a single list only hears about its own, and is dropped with it.
+    with _indexes_lock:
+        indexes = deck_data.indexes
+        listeners = [index for key, index in indexes.items() if not isinstance(key, tuple) or key[1] == list_name]
+        if event == "list_removed":
+            for key in [key for key in indexes if isinstance(key, tuple) and key[1] == list_name]:
+                del indexes[key]
+    for index in listeners:
+        handler = getattr(index, event, None)
+        if handler is not None:
+            handler(list_name, *args)
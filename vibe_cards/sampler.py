@@ -0,0 +1,77 @@
+import random
+
+# --- Constants & Config ---
+NEW_LIST_ACCURACY = 0.5 # Assumed for lists that were never answered (or not summarized yet)
+MIN_MISS_WEIGHT = 0.2 # Lists answered perfectly still come up, about a sixth as often as ones always missed
+
+
+def list_weight(accuracy):
+    # Per undrawn card: the more a list is missed, the more often it's drawn from
+    return MIN_MISS_WEIGHT + 1 - (NEW_LIST_ACCURACY if accuracy is None else accuracy)
+
+
+# --- Mixed Session Over Several Lists ---
+class MixedSampler:
+    # Interleaves the cards of several lists (default: the whole deck). Each step picks
+    # a list with probability proportional to its undrawn cards times list_weight of
+    # its recent accuracy (from the manifest, so no card is read to weigh it), then a
+    # card of that list at random, without repeats until every card was drawn; then a
+    # new round starts. Nothing is held per card beyond the ones drawn: starting costs
+    # O(lists), a list is read when first drawn from, and each step is O(lists).
+
+    def __init__(self, deck_data, list_names=None, rng=None, now=None):
+        self.deck_data = deck_data
+        self.rng = rng or random.Random()
+        self.lists = {} # list name -> [cards, drawn this round, weight, {slot: position} of the lazy shuffle]
+        for name in (list(deck_data) if list_names is None else [n for n in list_names if n in deck_data]):
+            summary = deck_data.summary(name, now)
+            self.lists[name] = [summary.get("cards", 0), 0, list_weight(summary.get("accuracy")), {}]
+        self.total = sum(entry[0] for entry in self.lists.values())
+        self.drawn = 0 # This round
+        self.rounds = 1
+        self.current = self._draw() # (list name, position), None once every list is empty
+
+    def __len__(self):
+        return self.total
+
+    def peek(self):
+        # The drawn card may have been deleted in the editor since: move on to one that exists
+        while self.current is not None:
+            name, position = self.current
+            if name in self.deck_data and position < len(self.deck_data[name]):
+                break
+            self.current = self._draw()
+        return self.current
+
+    def advance(self):
+        self.current = self._draw()
+
+    def _draw(self):
+        while self.total:
+            if self.drawn >= self.total:
+                for entry in self.lists.values():
+                    entry[1] = 0
+                    entry[3].clear()
+                self.drawn = 0
+                self.rounds += 1
+            names = [name for name, entry in self.lists.items() if entry[1] < entry[0]]
+            name = self.rng.choices(names, [(self.lists[n][0] - self.lists[n][1]) * self.lists[n][2] for n in names])[0]
+            entry = self.lists[name]
+            # The manifest count is as of the last write; the list itself is exact
+            size = len(self.deck_data[name]) if name in self.deck_data else 0
+            if size != entry[0]:
+                self.total += size - entry[0]
+                entry[0] = size
+                if entry[1] >= size:
+                    continue
+            # One step of a Fisher-Yates shuffle over the list's positions, keeping only
+            # the slots it has touched
+            slot = entry[1]
+            pick = self.rng.randrange(slot, size)
+            swaps = entry[3]
+            position = swaps.get(pick, pick)
+            swaps[pick] = swaps.pop(slot, slot)
+            entry[1] += 1
+            self.drawn += 1
+            return name, position
+        return None
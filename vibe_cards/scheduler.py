@@ -0,0 +1,172 @@
+import heapq
+import threading
+import time
+
+# --- Constants & Config ---
+DAY = 86400
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_INTERVAL = 36500 # Days; without a cap the interval grows geometrically until due dates overflow
+RELEARN_DELAY = 10 * 60 # A missed card comes back within the same sitting
+SKIP_DELAY = 60 # Seen but not graded (e.g. flip cards in interactive mode)
+
+
+# --- SM-2 Scheduling ---
+# Scheduling state lives next to attempts/hist in card["stats"]:
+#   due (epoch seconds, 0 = never studied), ease, interval (days), reps (successful streak)
+def card_due(card):
+    return card.get("stats", {}).get("due", 0)
+
+def schedule_review(stats, is_correct, now=None):
+    now = time.time() if now is None else now
+    quality = 4 if is_correct else 1 # SM-2 grades 0-5; the app only knows right/wrong
+    ease = stats.get("ease", DEFAULT_EASE)
+    interval = stats.get("interval", 0)
+    reps = stats.get("reps", 0)
+
+    if quality >= 3:
+        if reps == 0:
+            interval = 1
+        elif reps == 1:
+            interval = 6
+        else:
+            interval = min(MAX_INTERVAL, round(interval * ease))
+        reps += 1
+        due = now + interval * DAY
+    else:
+        reps = 0
+        interval = 0
+        due = now + RELEARN_DELAY
+
+    stats["ease"] = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    stats["interval"] = interval
+    stats["reps"] = reps
+    stats["due"] = due
+
+
+# --- Due Card Index ---
+class DueQueue:
+    # Min-heap of (due, position) over one list, holding exactly one entry per card.
+    # Building it is a single O(n) heapify; each step after that is O(log n).
+
+    def __init__(self, cards):
+        self.heap = [(card_due(card), pos) for pos, card in enumerate(cards)]
+        heapq.heapify(self.heap)
+        self.reviewed = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    @property
+    def due_now(self):
+        return self.count_due()
+
+    def count_due(self, now=None):
+        # Counted from the heap rather than kept: a skipped card comes due again later,
+        # so no counter updated in advance() would see it. The walk only descends while
+        # entries are due, O(cards due now).
+        now = time.time() if now is None else now
+        count, stack = 0, [0]
+        while stack:
+            i = stack.pop()
+            if i < len(self.heap) and self.heap[i][0] <= now:
+                count += 1
+                stack += (2 * i + 1, 2 * i + 2)
+        return count
+
+    def peek(self):
+        return self.heap[0][1]
+
+    def advance(self, card, now=None):
+        # `card` is the one at peek(); re-file it under its (possibly new) due date
+        now = time.time() if now is None else now
+        new_due = card_due(card)
+        if new_due <= now:
+            new_due = now + SKIP_DELAY
+        heapq.heapreplace(self.heap, (new_due, self.heap[0][1]))
+        self.reviewed += 1
+
+
+# --- Due Cards Of A Whole Deck ---
+class DueIndex:
+    # Per list, a min-heap of (due, card id) like DueQueue's, built the first time the
+    # list is asked for. Keyed by card id (positions shift when cards are deleted) and
+    # only ever walked, never popped: an answer files the card again under its new date,
+    # and the entry it had becomes stale, skipped when reached. A list's heap is rebuilt
+    # once stale entries outnumber live ones.
+
+    def __init__(self, deck_data):
+        self.deck_data = deck_data
+        self.heaps = {} # list name -> [(due, card id)]
+        self.filed = {} # list name -> {card id: (card, due it's filed under)}
+        self.lock = threading.Lock()
+
+    def due(self, names, horizon, limit):
+        # Up to `limit` (list name, card) of the lists `names` due by `horizon`, soonest
+        # first: a walk down the heaps from their roots, O(limit log limit) once built
+        with self.lock:
+            frontier = [(self.heaps[name][0], name, 0) for name in names if self._build(name)]
+            heapq.heapify(frontier)
+            results = []
+            refile = []
+            while frontier and len(results) < limit:
+                (due, card_id), name, i = heapq.heappop(frontier)
+                if due > horizon:
+                    break
+                heap = self.heaps[name]
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], name, child))
+                card, filed_due = self.filed[name].get(card_id, (None, None))
+                if filed_due != due:
+                    continue # Deleted, or filed again since
+                if card_due(card) != due:
+                    refile.append((name, card)) # Answered behind our back (replayed from another process's log)
+                    continue
+                results.append((name, card))
+            for name, card in refile:
+                self._file(name, card)
+            return results
+
+    def _build(self, name):
+        # False for an empty list
+        if name not in self.heaps:
+            cards = self.deck_data[name]
+            self.filed[name] = {card["id"]: (card, card_due(card)) for card in cards}
+            self._rebuild(name)
+        return bool(self.heaps[name])
+
+    def _rebuild(self, name):
+        heap = self.heaps[name] = [(due, card_id) for card_id, (_, due) in self.filed[name].items()]
+        heapq.heapify(heap)
+
+    def _file(self, name, card):
+        if name not in self.heaps:
+            return # Read with the list when first asked for
+        filed = self.filed[name]
+        due = card_due(card)
+        old = filed.get(card["id"])
+        filed[card["id"]] = (card, due)
+        if old is None or old[1] != due:
+            heap = self.heaps[name]
+            heapq.heappush(heap, (due, card["id"]))
+            if len(heap) > 2 * len(filed) + 64:
+                self._rebuild(name)
+
+    # --- Registry Events (edits leave the due date alone) ---
+    def card_added(self, list_name, card):
+        with self.lock:
+            self._file(list_name, card)
+
+    def card_answered(self, list_name, card):
+        with self.lock:
+            self._file(list_name, card)
+
+    def card_removed(self, list_name, card):
+        with self.lock:
+            self.filed.get(list_name, {}).pop(card["id"], None)
+
+    def list_removed(self, list_name):
+        with self.lock:
+            self.heaps.pop(list_name, None)
+            self.filed.pop(list_name, None)
@@ -0,0 +1,149 @@
+import bisect
+import re
+import threading
+
+from . import registry
+from .grading import normalize_answer, fold_accents
+from .trace import traced
+
+# --- Constants & Config ---
+TOKEN_PATTERN = re.compile(r"\w+")
+SEARCH_LIMIT = 50
+
+
+def tokenize(text):
+    # Same folding as grading: case- and accent-insensitive, so "eleve" finds "élève"
+    return TOKEN_PATTERN.findall(fold_accents(normalize_answer(text)))
+
+def card_tokens(card):
+    tokens = set(tokenize(card.get("front", "")))
+    tokens.update(tokenize(card.get("back", "")))
+    for distractor in card.get("distractors", []):
+        tokens.update(tokenize(distractor))
+    return tokens
+
+
+# --- Inverted Index ---
+class CardSearchIndex:
+    # token -> set of doc ids over front, back and distractors of every card of one user.
+    # Cards are tracked by identity, so the editor can add/remove them incrementally.
+
+    def __init__(self):
+        self.postings = {} # token -> {doc id}
+        self.vocab = [] # Sorted tokens, for prefix matching of the word being typed
+        self.docs = {} # doc id -> (list name, card, tokens)
+        self.doc_of = {} # id(card) -> doc id
+        self.next_doc = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    @traced("search.build")
+    def build(cls, deck_data):
+        index = cls()
+        for list_name, lst in deck_data.items():
+            for card in lst:
+                index._add(list_name, card, keep_sorted=False)
+        index.vocab = sorted(index.postings) # One sort instead of an insort per new token
+        return index
+
+    def add(self, list_name, card):
+        with self.lock:
+            self._add(list_name, card)
+
+    def remove(self, card):
+        with self.lock:
+            self._remove(card)
+
+    def remove_list(self, list_name):
+        with self.lock:
+            for doc, (name, card, _) in list(self.docs.items()):
+                if name == list_name:
+                    self._remove(card)
+
+    # --- Registry Events ---
+    def card_added(self, list_name, card):
+        self.add(list_name, card)
+
+    def card_removed(self, list_name, card):
+        self.remove(card)
+
+    def card_edited(self, list_name, card):
+        with self.lock:
+            self._remove(card) # Its tokens as indexed, before the edit
+            self._add(list_name, card)
+
+    def list_removed(self, list_name):
+        self.remove_list(list_name)
+
+    def _add(self, list_name, card, keep_sorted=True):
+        tokens = card_tokens(card)
+        doc = self.next_doc
+        self.next_doc += 1
+        self.docs[doc] = (list_name, card, tokens)
+        self.doc_of[id(card)] = doc
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = set()
+                if keep_sorted:
+                    bisect.insort(self.vocab, token)
+            posting.add(doc)
+
+    def _remove(self, card):
+        doc = self.doc_of.pop(id(card), None)
+        if doc is None:
+            return
+        _, _, tokens = self.docs.pop(doc)
+        for token in tokens:
+            posting = self.postings[token]
+            posting.discard(doc)
+            if not posting:
+                del self.postings[token]
+                del self.vocab[bisect.bisect_left(self.vocab, token)]
+
+    @traced("search")
+    def search(self, query, limit=SEARCH_LIMIT):
+        # Every word must match; the last one also matches as a prefix (search as you type).
+        # Returns up to `limit` (list name, card) pairs.
+        words = tokenize(query)
+        if not words:
+            return []
+        *exact, prefix = words
+        with self.lock:
+            candidates = None
+            for word in sorted(exact, key=lambda w: len(self.postings.get(w, ()))):
+                posting = self.postings.get(word)
+                if not posting:
+                    return []
+                candidates = set(posting) if candidates is None else candidates & posting
+                if not candidates:
+                    return []
+
+            results = []
+            if candidates is not None:
+                # Narrowed by whole words already: check the prefix against each doc
+                for doc in candidates:
+                    name, card, tokens = self.docs[doc]
+                    if prefix in tokens or any(t.startswith(prefix) for t in tokens):
+                        results.append((name, card))
+                        if len(results) >= limit:
+                            break
+                return results
+
+            seen = set()
+            i = bisect.bisect_left(self.vocab, prefix)
+            while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+                for doc in self.postings[self.vocab[i]]:
+                    if doc not in seen:
+                        seen.add(doc)
+                        name, card, _ = self.docs[doc]
+                        results.append((name, card))
+                        if len(results) >= limit:
+                            return results
+                i += 1
+            return results
+
+
+def get_search_index(username, deck_data, build=True):
+    # Rebuilt only when the user's deck object itself is replaced (e.g. reloaded from disk)
+    return registry.get_index(deck_data, "search", CardSearchIndex.build if build else None)
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import secrets
+import signal
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from .auth import verify_password
+from .storage import get_storage
+from .sync import DUE_LIMIT, due_cards, record_answers
+from .trace import span
+
+# --- Constants & Config ---
+# Local by default: to reach it from phones, put a TLS-terminating proxy in front
+HOST = os.environ.get("VIBE_CARDS_SYNC_HOST", "127.0.0.1")
+PORT = int(os.environ.get("VIBE_CARDS_SYNC_PORT", "8765"))
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_BATCH = 10000 # Answers per POST /reviews
+MAX_DUE_LIMIT = 1000
+TOKEN_TTL = 12 * 3600
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+# --- API ---
+#   POST /login    {"username", "password"}                 -> {"token", "expires_at"}
+#   POST /reviews  {"reviews": [{"id", "ok", "ts"?}, ...]}  -> {"applied", "unknown": [card ids]}
+#   GET  /due?limit=&within=&list=                          -> {"cards": [{"id", "list", "front", "back", ...}]}
+#   GET  /health                                            -> {"ok": true}
+# Everything but /login and /health needs "Authorization: Bearer <token>".
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Service ---
+class SyncService:
+    # Storage calls block (files, SQLite, PBKDF2), so they run on worker threads. One
+    # user's requests are applied one at a time, in arrival order; users run in parallel.
+
+    def __init__(self, storage=None):
+        self.storage = storage or get_storage()
+        self.tokens = {} # token -> (username, expires at)
+        self.decks = {} # username -> deck
+        self.user_locks = {} # username -> asyncio.Lock
+
+    def deck(self, username):
+        # Kept between requests; reloaded when someone else (e.g. the app) wrote since
+        deck = self.decks.get(username)
+        deck = self.storage.load_deck(username) if deck is None else self.storage.refresh_deck(username, deck)
+        self.decks[username] = deck
+        return deck
+
+    # --- Handlers (worker threads) ---
+    def login(self, body):
+        username, password = body.get("username"), body.get("password")
+        if not isinstance(username, str) or not isinstance(password, str):
+            raise HttpError(400, "username and password are required")
+        if not verify_password(self.storage.get_password(username), password):
+            raise HttpError(401, "invalid credentials")
+        now = time.time()
+        for token, (_, expires_at) in list(self.tokens.items()): # Tokens never presented again
+            if expires_at < now:
+                self.tokens.pop(token, None)
+        token = secrets.token_urlsafe(32)
+        expires_at = now + TOKEN_TTL
+        self.tokens[token] = (username, expires_at)
+        return {"token": token, "expires_at": expires_at}
+
+    def reviews(self, username, body):
+        items = body.get("reviews")
+        if not isinstance(items, list):
+            raise HttpError(400, "expected {\"reviews\": [...]}")
+        if len(items) > MAX_BATCH:
+            raise HttpError(413, f"at most {MAX_BATCH} reviews per request")
+        answers = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("id"), int) or not isinstance(item.get("ok"), bool):
+                raise HttpError(400, "each review needs an integer id and a boolean ok")
+            ts = item.get("ts")
+            if ts is not None and not isinstance(ts, (int, float)):
+                raise HttpError(400, "ts must be epoch seconds")
+            answers.append((item["id"], item["ok"], ts))
+        with span("sync.reviews", user=username) as s:
+            deck = self.deck(username)
+            applied, unknown = record_answers(username, deck, answers, self.storage)
+            s.set(applied=applied)
+        return {"applied": applied, "unknown": unknown}
+
+    def due(self, username, query):
+        try:
+            limit = min(int(query.get("limit", [DUE_LIMIT])[0]), MAX_DUE_LIMIT)
+            within = float(query.get("within", [0])[0])
+        except ValueError:
+            raise HttpError(400, "limit and within must be numbers")
+        with span("sync.due", user=username):
+            cards = due_cards(self.deck(username), limit, within, query.get("list"))
+        return {"cards": [
+            {
+                "id": card["id"], "list": list_name, "front": card["front"], "back": card["back"],
+                "enable_write": card["enable_write"], "enable_choice": card["enable_choice"],
+                "distractors": card["distractors"], "due": card["stats"].get("due", 0),
+            }
+            for list_name, card in cards
+        ]}
+
+    # --- Routing ---
+    def authenticate(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        entry = self.tokens.get(token) if scheme.lower() == "bearer" else None
+        if entry is None or entry[1] < time.time():
+            self.tokens.pop(token, None)
+            raise HttpError(401, "log in first (POST /login) and send Authorization: Bearer <token>")
+        return entry[0]
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        routes = {"/health": "GET", "/login": "POST", "/reviews": "POST", "/due": "GET"}
+        if url.path not in routes:
+            raise HttpError(404, f"no such endpoint: {url.path}")
+        if method != routes[url.path]:
+            raise HttpError(405, f"{url.path} takes {routes[url.path]}")
+        if url.path == "/health":
+            return {"ok": True}
+        payload = {}
+        if method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "body must be JSON")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "body must be a JSON object")
+        loop = asyncio.get_running_loop()
+        if url.path == "/login":
+            return await loop.run_in_executor(None, self.login, payload)
+        username = self.authenticate(headers)
+        lock = self.user_locks.setdefault(username, asyncio.Lock())
+        async with lock:
+            if url.path == "/reviews":
+                return await loop.run_in_executor(None, self.reviews, username, payload)
+            return await loop.run_in_executor(None, self.due, username, parse_qs(url.query))
+
+    # --- HTTP/1.1 (keep-alive, JSON only) ---
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length") or "0"
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    if not length.isdecimal():
+                        keep_alive = False # Where the body ends is unknown
+                        raise HttpError(400, "Content-Length must be a byte count")
+                    length = int(length)
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False # The unread body would be taken for the next request
+                        raise HttpError(413, f"body over {MAX_BODY_BYTES} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = 200, await self.dispatch(method, target, headers, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e: # Keep serving; the client sees a 500
+                    print(f"vibe-cards sync: {method} {target} failed: {e!r}")
+                    status, payload = 500, {"error": "internal error"}
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host=HOST, port=PORT, storage=None):
+    service = SyncService(storage)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"vibe-cards sync listening on http://{host}:{port}")
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set) # Exit normally, so queued deck writes are flushed
+    async with server:
+        await stop.wait()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m vibe_cards.server", description="Review sync API for offline and headless clients")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,1314 @@
+import atexit
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+from .card_stats import new_stats, apply_review, card_tally, upgrade_stats
+from .deck import SCHEMA_VERSION, LazyDeck
+from .trace import span, traced
+
+try:
+    import fcntl # Cross-process locks; without it (Windows) locking is per process only
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson # Optional: several times faster to parse and write than the json module
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# --- Constants & Config ---
+DATA_FOLDER = "user_data"
+STORAGE_BACKEND = os.environ.get("VIBE_CARDS_STORAGE", "json") # json, sqlite
+SQLITE_FILE = os.environ.get("VIBE_CARDS_DB", os.path.join(DATA_FOLDER, "vibe_cards.db"))
+REVIEW_LOG_COMPACT_EVERY = 200 # Fold the review log back into the deck file after this many answers
+CACHE_MAX_BYTES = int(os.environ.get("VIBE_CARDS_CACHE_MB", "256")) * 1024 * 1024
+WRITE_BEHIND_DELAY = float(os.environ.get("VIBE_CARDS_WRITE_DELAY", "0.5")) # Quiet time before a deck is flushed
+WRITE_BEHIND_MAX_DELAY = 5.0 # A busy deck is still flushed at least this often
+WRITE_RETRY_DELAY = 1.0 # After a failed write; doubled after each further failure
+WRITE_RETRY_MAX_DELAY = 60.0
+
+
+# --- Card Helpers (shared by every backend) ---
+def default_deck(username):
+    return {
+        "Default": [
+            {
+                "id": 1,
+                "front": f"Welcome {username}!",
+                "back": "This is your private deck.",
+                "enable_write": False,
+                "enable_choice": False,
+                "distractors": [],
+                "stats": new_stats()
+            }
+        ]
+    }
+
+
+# --- JSON Codec ---
+# Data files are UTF-8 JSON, read and written as bytes with whichever codec is present
+def loads_json(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def dumps_json(data):
+    return orjson.dumps(data) if orjson is not None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+def read_json(path):
+    with open(path, "rb") as f:
+        with span("json.decode", file=os.path.basename(path)):
+            return loads_json(f.read())
+
+
+# --- Parsed File Cache ---
+def file_stamp(*paths):
+    # (mtime, size) of each backing file; any write, here or in another process, changes it
+    stamp = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+            stamp.append((info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+class FileCache:
+    # Process-wide LRU of parsed files, shared by every Streamlit session. Entries are
+    # only served while their stamp still matches the files on disk; the memory cap is
+    # approximated by the on-disk size of what was parsed.
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict() # key -> (stamp, value, cost)
+        self._lock = threading.Lock()
+
+    def get(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1]
+
+    def put(self, key, stamp, value, cost):
+        with self._lock:
+            self._discard(key)
+            if cost > self.max_bytes:
+                return
+            self._entries[key] = (stamp, value, cost)
+            self.total_bytes += cost
+            while self.total_bytes > self.max_bytes:
+                _, (_, _, old_cost) = self._entries.popitem(last=False)
+                self.total_bytes -= old_cost
+
+    def update(self, key, value, stamp=None, grow=0):
+        # For an entry still holding `value`: a new stamp after writing to its files,
+        # and/or `grow` more bytes parsed into it since (a list of a deck, read on use).
+        # False if the entry is gone or holds something else.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] is not value:
+                return False
+            cost = entry[2] + grow
+            self._discard(key)
+            if cost > self.max_bytes:
+                return False
+            self._entries[key] = (entry[0] if stamp is None else stamp, value, cost)
+            self.total_bytes += cost
+            while self.total_bytes > self.max_bytes:
+                _, (_, _, old_cost) = self._entries.popitem(last=False)
+                self.total_bytes -= old_cost
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+
+# --- Atomic Writes & Locking ---
+class FileLock:
+    # Exclusive lock for one data file: a re-entrant thread lock shared by every user
+    # of the path in this process, plus flock() on "<path>.lock" for other processes.
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        with FileLock._locks_guard:
+            self._state = FileLock._locks.setdefault(self.path, {"lock": threading.RLock(), "depth": 0, "fd": None})
+
+    def __enter__(self):
+        state = self._state
+        state["lock"].acquire()
+        state["depth"] += 1
+        if state["depth"] == 1 and fcntl is not None:
+            state["fd"] = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(state["fd"], fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        state = self._state
+        state["depth"] -= 1
+        if state["depth"] == 0 and state["fd"] is not None:
+            fcntl.flock(state["fd"], fcntl.LOCK_UN)
+            os.close(state["fd"])
+            state["fd"] = None
+        state["lock"].release()
+
+def atomic_write_json(path, data):
+    # Readers see either the old file or the new one, never a truncated one
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            with span("json.encode", file=os.path.basename(path)):
+                f.write(dumps_json(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def create_json(path, data):
+    # Like atomic_write_json, but only if `path` doesn't exist yet: False if it does.
+    # The hard link either places the complete file or fails, even across processes.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(dumps_json(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# --- Write-Behind Queue ---
+class WriteBehind:
+    # Coalesces bursts of writes to the same key into one flush on a background
+    # thread: a key is flushed once it has been quiet for `delay` seconds, and never
+    # later than `max_delay` after its first pending write. A write that fails is
+    # kept and tried again after a growing pause, until it succeeds or is replaced.
+
+    def __init__(self, delay=WRITE_BEHIND_DELAY, max_delay=WRITE_BEHIND_MAX_DELAY):
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {} # key -> [write function, first submit time, last submit time, failures so far]
+        self._running = set() # Keys being written right now
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def submit(self, key, write):
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [write, now, now, 0]
+            else:
+                entry[0] = write
+                entry[2] = now
+            self._start()
+            self._cond.notify_all()
+
+    def flush(self, key=None):
+        # Synchronously write one key (or everything) that is still pending, once a
+        # background write of it has finished. A write that fails again stays queued.
+        with self._cond:
+            while self._running if key is None else key in self._running:
+                self._cond.wait()
+            keys = list(self._pending) if key is None else [key]
+            entries = {k: self._pending.pop(k) for k in keys if k in self._pending}
+        for k, entry in entries.items():
+            self._write(k, entry)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vibe-cards-write-behind", daemon=True)
+            self._thread.start()
+
+    def _due(self, entry):
+        _, first, last, failures = entry
+        if failures:
+            return last + min(WRITE_RETRY_MAX_DELAY, WRITE_RETRY_DELAY * 2 ** (failures - 1))
+        return min(last + self.delay, first + self.max_delay)
+
+    def _write(self, key, entry):
+        try:
+            entry[0]()
+        except Exception:
+            logger.exception("Write of %r failed (attempt %d), retrying", key, entry[3] + 1)
+            with self._cond:
+                if key not in self._pending: # A newer write replaces this one
+                    entry[2] = time.monotonic()
+                    entry[3] += 1
+                    self._pending[key] = entry
+                    self._start()
+                    self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                now = time.monotonic()
+                ready = {key: entry for key, entry in self._pending.items() if self._due(entry) <= now}
+                if not ready:
+                    self._cond.wait(max(0.0, min(self._due(entry) for entry in self._pending.values()) - now))
+                    continue
+                for key in ready:
+                    del self._pending[key]
+                self._running.update(ready)
+            for key, entry in ready.items():
+                self._write(key, entry)
+            with self._cond:
+                self._running.difference_update(ready)
+                self._cond.notify_all()
+
+
+# --- JSON Files Backend ---
+class JsonStorage:
+    # One file per account under users/<shard>/, then per user a <user>_manifest.json (lists, card and due counts),
+    # one file per list in <user>_lists/ and a <user>_reviews.jsonl append-only answer
+    # log, moved on to <user>_history.jsonl (every answer ever, for exports) once its
+    # answers are in the lists. Files are written atomically by a write-behind thread,
+    # only for the lists that changed; every write is guarded by a FileLock on the manifest.
+
+    def __init__(self, data_folder=DATA_FOLDER):
+        self.data_folder = data_folder
+        self.users_folder = os.path.join(data_folder, "users")
+        self.legacy_users_file = os.path.join(data_folder, "users.json") # Every account in one file (older versions)
+        self._pending_reviews = {} # username -> answers logged since the last snapshot
+        self._users_migrated = False
+        self.cache = FileCache()
+        self.writer = WriteBehind()
+
+    def ensure_data_folder(self):
+        if not os.path.exists(self.data_folder):
+            os.makedirs(self.data_folder)
+
+    # --- Accounts ---
+    # An account is looked up, created or updated by reading or writing its own file,
+    # so neither login nor signup depends on how many accounts exist.
+    def get_user_file(self, username):
+        shard = hashlib.sha1(username.encode("utf-8")).hexdigest()[:2] # 256 folders
+        return os.path.join(self.users_folder, shard, f"{quote(username, safe='')}.json")
+
+    def get_password(self, username):
+        # The stored password hash, or None for an unknown user
+        self.migrate_users_file()
+        try:
+            return read_json(self.get_user_file(username))["password"]
+        except FileNotFoundError:
+            return None
+
+    def add_user(self, username, password):
+        # Created atomically, so of two concurrent signups (from any worker process)
+        # exactly one wins. False if the name is taken.
+        self.migrate_users_file()
+        path = self.get_user_file(username)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return create_json(path, {"username": username, "password": password})
+
+    def set_password(self, username, password):
+        path = self.get_user_file(username)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_json(path, {"username": username, "password": password})
+
+    def load_users(self):
+        # Every account: reads one file per user, for tools (migration), not for login
+        self.migrate_users_file()
+        users = {}
+        for path in self.iter_user_files():
+            record = read_json(path)
+            users[record["username"]] = record["password"]
+        return users
+
+    def save_users(self, users):
+        for username, password in users.items():
+            self.set_password(username, password)
+
+    def iter_user_files(self):
+        if os.path.exists(self.users_folder):
+            for shard in os.listdir(self.users_folder):
+                for name in os.listdir(os.path.join(self.users_folder, shard)):
+                    if name.endswith(".json"):
+                        yield os.path.join(self.users_folder, shard, name)
+
+    def migrate_users_file(self):
+        # users.json of older versions is split into account files once, then removed.
+        # Accounts that already have a file keep it.
+        if self._users_migrated or not os.path.exists(self.legacy_users_file):
+            self._users_migrated = True
+            return
+        with FileLock(self.legacy_users_file):
+            if os.path.exists(self.legacy_users_file):
+                with open(self.legacy_users_file, "r") as f:
+                    legacy = json.load(f)
+                for username, password in legacy.items():
+                    path = self.get_user_file(username)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    create_json(path, {"username": username, "password": password})
+                os.remove(self.legacy_users_file)
+        self._users_migrated = True
+
+    def get_user_deck_file(self, username):
+        # Single-file deck written by older versions, split into lists on first load
+        self.ensure_data_folder()
+        return os.path.join(self.data_folder, f"{username}_deck.json")
+
+    def get_user_manifest(self, username):
+        self.ensure_data_folder()
+        return os.path.join(self.data_folder, f"{username}_manifest.json")
+
+    def get_user_lists_folder(self, username):
+        return os.path.join(self.data_folder, f"{username}_lists")
+
+    def get_user_review_log(self, username):
+        self.ensure_data_folder()
+        return os.path.join(self.data_folder, f"{username}_reviews.jsonl")
+
+    def get_user_history(self, username):
+        self.ensure_data_folder()
+        return os.path.join(self.data_folder, f"{username}_history.jsonl")
+
+    def retire_review_log(self, username):
+        # Under the deck lock, once every answer in the review log is in the list files:
+        # its complete lines go on to the history, then it's removed (a crash in between
+        # only repeats them in the history)
+        log_path = self.get_user_review_log(username)
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, "rb") as f:
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1] # Without a torn final line
+        if data:
+            with open(self.get_user_history(username), "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        os.remove(log_path)
+
+    def replay_review_log(self, username, deck, start=0):
+        # Entries point at the list files they were written against: any structural
+        # edit goes through save_deck, which clears the log. Only the lists the log
+        # mentions get loaded. Applies the entries from byte `start` on; returns
+        # (answers applied, bytes of the log read).
+        log_path = self.get_user_review_log(username)
+        if not os.path.exists(log_path):
+            return 0, 0
+        replayed = 0
+        end = start
+        with open(log_path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # Still being appended (or torn by a crash): read again next time
+                end += len(line)
+                try:
+                    entry = loads_json(line)
+                except ValueError:
+                    continue # Torn final line from an interrupted append
+                list_name = entry.get("list")
+                if list_name not in deck:
+                    continue
+                lst = deck[list_name]
+                pos = entry.get("pos", -1)
+                if 0 <= pos < len(lst) and lst[pos].get("id") == entry.get("id"):
+                    apply_review(lst[pos], entry["ok"], entry.get("ts"))
+                    deck.note_review(list_name, entry.get("ts"))
+                    deck.touch(list_name)
+                    replayed += 1
+        return replayed, end
+
+    def catch_up(self, username, deck):
+        # Under the deck lock: applies the answers other processes (the sync server,
+        # another app instance) logged since this deck last read or wrote the files.
+        # False when the lists themselves were written since, which the log can't replay.
+        if deck.synced is None:
+            return False
+        manifest_stamp, offset, next_id = deck.synced
+        log_stamp = file_stamp(self.get_user_review_log(username))[0]
+        if file_stamp(self.get_user_manifest(username)) != manifest_stamp or (log_stamp[1] if log_stamp else 0) < offset:
+            return False
+        if log_stamp and log_stamp[1] > offset:
+            _, offset = self.replay_review_log(username, deck, offset)
+            deck.synced = (manifest_stamp, offset, next_id)
+        return True
+
+    def merge_deck(self, username, deck):
+        # Under the deck lock, once another process wrote the lists since `deck` read
+        # them: the stored deck (and its log) with the lists `deck` edited, created or
+        # deleted done again on top. A card answered on both sides keeps the stats with
+        # more attempts; cards `deck` added get new ids if the other side used theirs.
+        fresh, _ = self.open_deck(username)
+        known_next_id = deck.synced[2]
+        renumber = fresh.next_id > known_next_id # The other side handed out ids ours may repeat
+        if not renumber:
+            fresh.next_id = max(fresh.next_id, deck.next_id)
+        _, removed, edited, _ = deck.take_changes()
+        gone = {entry["file"] for entry in removed if "file" in entry}
+        for name in fresh:
+            if fresh.manifest[name].get("file") in gone:
+                del fresh[name]
+        for name in edited:
+            if name not in deck:
+                continue
+            cards = deck[name]
+            stored = {card.get("id"): card for card in fresh[name]} if name in fresh else {}
+            for card in cards:
+                if card["id"] >= known_next_id:
+                    if renumber:
+                        card["id"] = fresh.allocate_id()
+                    continue
+                other = stored.get(card["id"])
+                if other is not None and other["stats"].get("attempts", 0) > card["stats"].get("attempts", 0):
+                    card["stats"] = other["stats"]
+            fresh[name] = cards
+        self.cache.discard(("deck", username))
+        return fresh
+
+    def refresh_deck(self, username, deck_data):
+        # The deck as stored now, for a session or the sync server holding one across
+        # requests: `deck_data` itself while nothing else wrote, else loaded again (which
+        # does this deck's own pending write first). Two stat() calls when current.
+        if not isinstance(deck_data, LazyDeck) or deck_data.owner is not self:
+            return deck_data
+        if deck_data.synced is not None:
+            manifest_stamp, offset, _ = deck_data.synced
+            log_stamp = file_stamp(self.get_user_review_log(username))[0]
+            if file_stamp(self.get_user_manifest(username)) == manifest_stamp and (log_stamp[1] if log_stamp else 0) == offset:
+                return deck_data
+        return self.load_deck(username)
+
+    def deck_stamp(self, username):
+        return file_stamp(self.get_user_manifest(username), self.get_user_review_log(username))
+
+    def change_stamp(self, username):
+        # Differs whenever anything of the user's deck was written since (for backups)
+        return [list(s) if s else None for s in file_stamp(
+            self.get_user_manifest(username), self.get_user_review_log(username), self.get_user_deck_file(username)
+        )]
+
+    def iter_reviews(self, username):
+        # Every answer ever given, oldest first: the history, then the review log. Both
+        # are measured under the lock, so a compaction meanwhile neither drops nor repeats any.
+        history_path = self.get_user_history(username)
+        with FileLock(self.get_user_manifest(username)):
+            history_size = os.path.getsize(history_path) if os.path.exists(history_path) else 0
+            log_path = self.get_user_review_log(username)
+            log = b""
+            if os.path.exists(log_path):
+                with open(log_path, "rb") as f:
+                    log = f.read()
+        if history_size:
+            with open(history_path, "rb") as f:
+                yield from self._iter_log_lines(f, history_size)
+        yield from self._iter_log_lines(io.BytesIO(log), len(log))
+
+    def _iter_log_lines(self, f, size):
+        read = 0
+        for line in f:
+            read += len(line)
+            if read > size or not line.endswith(b"\n"):
+                break
+            try:
+                entry = loads_json(line)
+            except ValueError:
+                continue # Torn line from an interrupted append
+            yield {"list": entry.get("list"), "id": entry.get("id"), "ok": entry.get("ok"), "ts": entry.get("ts")}
+
+    def cache_deck(self, username, deck_data):
+        # Costed by the bytes parsed into it: manifest, review log and every loaded list
+        stamp = self.deck_stamp(username)
+        entries = [deck_data.manifest.get(name, {}) for name, _ in deck_data.loaded_items()]
+        lists = file_stamp(*(self.get_list_file(username, entry) for entry in entries if "file" in entry))
+        self.cache.put(("deck", username), stamp, deck_data, sum(s[1] for s in stamp + lists if s))
+
+    def get_list_file(self, username, entry):
+        return os.path.join(self.get_user_lists_folder(username), entry["file"])
+
+    def load_deck(self, username):
+        # Only the manifest is read here; lists are read when first used. Sessions of
+        # the same user share one cached deck object, so an answer recorded in one tab
+        # is already visible in the others.
+        with span("load_deck", user=username) as s:
+            deck = self._load_deck(username)
+            s.set(lists=len(deck))
+        return deck
+
+    def _load_deck(self, username):
+        self.writer.flush(("deck", username)) # Disk must be current before it's compared or read
+        deck = self.cache.get(("deck", username), self.deck_stamp(username))
+        if deck is not None:
+            return deck
+
+        with FileLock(self.get_user_manifest(username)):
+            # Answers logged since the last write: apply them, then compact once
+            deck, replayed = self.open_deck(username)
+            if replayed or deck.dirty:
+                self.queue_write(username, deck)
+            else:
+                self.retire_review_log(username)
+        self.cache_deck(username, deck)
+        return deck
+
+    def read_deck(self, username):
+        # The deck as stored, for exports and backups: answers in the review log are
+        # applied in memory only, nothing is cached or written back, and a user without
+        # a deck gets an empty one
+        with FileLock(self.get_user_manifest(username)):
+            deck, _ = self.open_deck(username, write_back=False)
+        return deck
+
+    def open_deck(self, username, write_back=True):
+        # Under the deck lock: the stored deck plus the answers logged since, and how
+        # many those were. With write_back, lists older than SCHEMA_VERSION are written
+        # back once upgraded and a user without a deck gets the welcome deck.
+        manifest_path = self.get_user_manifest(username)
+        if os.path.exists(manifest_path):
+            data = read_json(manifest_path)
+            manifest = {entry.pop("name"): entry for entry in data["lists"]}
+            deck = LazyDeck(
+                self, manifest, lambda name, entry: self.load_list(username, entry), data.get("next_id", 1),
+                on_upgrade=(lambda name: self.queue_write(username, deck)) if write_back else None,
+                on_load=(lambda name: self.cache.update(("deck", username), deck, grow=sum(
+                    s[1] for s in file_stamp(self.get_list_file(username, deck.manifest[name])) if s
+                ))) if write_back else None,
+            )
+        elif write_back or os.path.exists(self.get_user_deck_file(username)):
+            deck = LazyDeck.from_dict(self, self.load_legacy_deck(username))
+        else:
+            deck = LazyDeck(self, {}, None)
+        replayed, offset = self.replay_review_log(username, deck)
+        deck.synced = (file_stamp(manifest_path), offset, deck.next_id)
+        return deck, replayed
+
+    def load_legacy_deck(self, username):
+        deck_path = self.get_user_deck_file(username)
+        if not os.path.exists(deck_path):
+            return default_deck(username)
+        data = read_json(deck_path)
+        return {"Default": data} if isinstance(data, list) else data
+
+    def load_list(self, username, entry):
+        path = self.get_list_file(username, entry)
+        if not os.path.exists(path):
+            return [] # Deleted by another process since our manifest was read
+        return read_json(path)
+
+    def own_deck(self, deck_data):
+        # A deck this storage didn't load (another backend's, or a plain dict) is saved in full
+        if isinstance(deck_data, LazyDeck) and deck_data.owner is self:
+            return deck_data
+        return LazyDeck.from_dict(self, dict(deck_data.items()))
+
+    def save_deck(self, username, deck_data, lists=None):
+        # `lists` names the lists whose cards changed (None: every loaded list). Queued:
+        # a burst of edits becomes a single write of those lists and the manifest.
+        deck = self.own_deck(deck_data)
+        for name in (dict(deck.loaded_items()) if lists is None else lists):
+            if name not in deck.card_changes: # Else noted card by card by CardIndex, summary and all
+                deck.touch(name)
+                deck.edited.add(name)
+        self.queue_write(username, deck)
+
+    def queue_write(self, username, deck):
+        self._pending_reviews[username] = 0
+        self.writer.submit(("deck", username), lambda: self.write_deck(username, deck))
+
+    def write_deck(self, username, deck):
+        # Changed lists first, then the manifest that points at them: a crash in between
+        # leaves the previous manifest, which still names only complete files
+        manifest_path = self.get_user_manifest(username)
+        folder = self.get_user_lists_folder(username)
+        with span("write_deck", user=username), FileLock(manifest_path):
+            # Answers other processes logged go in with ours. If they wrote the lists
+            # instead, every answer of this deck is in their files or the log already;
+            # its edits, if any, are made again on the deck as stored now, which the
+            # sessions holding `deck` switch to on their next refresh_deck.
+            if not self.catch_up(username, deck) and deck.synced is not None:
+                if not (deck.edited or deck.removed):
+                    deck.take_changes()
+                    self.cache.discard(("deck", username))
+                    return
+                deck = self.merge_deck(username, deck)
+            os.makedirs(folder, exist_ok=True)
+            dirty, removed, edited, card_changes = deck.take_changes()
+            try:
+                for name, cards in dirty.items():
+                    entry = deck.manifest.get(name)
+                    if entry is None:
+                        continue # Deleted since
+                    entry.setdefault("file", f"{uuid.uuid4().hex}.json")
+                    atomic_write_json(os.path.join(folder, entry["file"]), cards)
+                atomic_write_json(manifest_path, {
+                    "next_id": deck.next_id,
+                    "lists": [dict(deck.summary(name), name=name) for name in deck],
+                })
+            except BaseException:
+                deck.restore_changes(dirty, removed, edited, card_changes)
+                raise
+            # Files of deleted lists, the single-file deck of older versions, and the
+            # review log, caught up above, whose answers are all in the written lists now
+            keep = {entry.get("file") for entry in deck.manifest.values()}
+            for file_name in os.listdir(folder):
+                if file_name.endswith(".json") and file_name not in keep:
+                    os.remove(os.path.join(folder, file_name))
+            if os.path.exists(self.get_user_deck_file(username)):
+                os.remove(self.get_user_deck_file(username))
+            self.retire_review_log(username)
+            deck.synced = (file_stamp(manifest_path), 0, deck.next_id)
+            self.cache_deck(username, deck)
+
+    def record_review(self, username, deck_data, list_name, position, card, is_correct):
+        self.record_reviews(username, deck_data, [(list_name, position, card, is_correct, time.time())])
+
+    @traced("record_review")
+    def record_reviews(self, username, deck_data, reviews):
+        # `reviews`: (list name, position, card, is_correct, answered at), oldest first.
+        # Applying and logging under the deck lock keeps a concurrent write from
+        # capturing the answers while their log lines are still missing (or vice
+        # versa); a batch is one lock and one append.
+        lines = []
+        with FileLock(self.get_user_manifest(username)):
+            current = self.catch_up(username, deck_data) # Another process's answers to these cards count first
+            for list_name, position, card, is_correct, answered_at in reviews:
+                apply_review(card, is_correct, answered_at)
+                lines.append(json.dumps({
+                    "list": list_name, "pos": position, "id": card.get("id"), "ok": is_correct, "ts": answered_at
+                }) + "\n")
+                deck_data.note_review(list_name, answered_at)
+                deck_data.touch(list_name)
+            with open(self.get_user_review_log(username), "a") as f:
+                f.write("".join(lines))
+                if current:
+                    deck_data.synced = (deck_data.synced[0], f.tell(), deck_data.synced[2])
+            # Only the cached object itself is known to match the files + log
+            if not (current and self.cache.update(
+                ("deck", username), deck_data, self.deck_stamp(username), sum(len(line) for line in lines)
+            )):
+                self.cache.discard(("deck", username))
+        # Periodic compaction keeps the log (and replay on load) short
+        self._pending_reviews[username] = self._pending_reviews.get(username, 0) + len(reviews)
+        if self._pending_reviews[username] >= REVIEW_LOG_COMPACT_EVERY:
+            self.queue_write(username, deck_data)
+
+    def compact(self, username, deck_data):
+        # Also writes changes whose queued write was lost or failed
+        unsaved = isinstance(deck_data, LazyDeck) and (deck_data.dirty or deck_data.removed)
+        if self._pending_reviews.get(username) or unsaved:
+            self.queue_write(username, deck_data)
+        self.writer.flush(("deck", username))
+
+    def upgrade_deck(self, username):
+        # Lists older than SCHEMA_VERSION, upgraded and written back now instead of when
+        # first loaded. Returns how many.
+        deck = self.load_deck(username)
+        old = [name for name in deck if deck.manifest[name].get("version", 1) < SCHEMA_VERSION]
+        for name in old:
+            deck[name]
+        self.compact(username, deck)
+        return len(old)
+
+    def next_card_id(self, username):
+        return self.load_deck(username).next_id
+
+    def import_cards(self, username, list_name, batches):
+        # Only the target list is loaded and rewritten
+        deck = self.load_deck(username)
+        if list_name not in deck:
+            deck[list_name] = []
+        lst = deck[list_name]
+        for batch in batches:
+            lst.extend(batch)
+            deck.next_id = max(deck.next_id, max(card["id"] for card in batch) + 1)
+        self.save_deck(username, deck, [list_name])
+
+    def list_usernames(self):
+        self.ensure_data_folder()
+        self.migrate_users_file()
+        users = {unquote(os.path.basename(path)[:-len(".json")]) for path in self.iter_user_files()}
+        for name in os.listdir(self.data_folder):
+            for suffix in ("_manifest.json", "_deck.json"):
+                if name.endswith(suffix):
+                    users.add(name[:-len(suffix)])
+        return sorted(users)
+
+
+# --- SQLite Backend ---
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lists (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    UNIQUE (username, name)
+);
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    list_id INTEGER NOT NULL REFERENCES lists(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    card_id INTEGER,
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    enable_write INTEGER NOT NULL DEFAULT 0,
+    enable_choice INTEGER NOT NULL DEFAULT 0,
+    distractors TEXT NOT NULL DEFAULT '[]',
+    stats TEXT NOT NULL,
+    UNIQUE (list_id, position)
+);
+CREATE INDEX IF NOT EXISTS cards_by_id ON cards (list_id, card_id);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    list_name TEXT NOT NULL,
+    card_id INTEGER,
+    ok INTEGER NOT NULL,
+    reviewed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_by_card ON reviews (username, card_id);
+CREATE TABLE IF NOT EXISTS decks (
+    username TEXT PRIMARY KEY,
+    next_card_id INTEGER NOT NULL
+);
+"""
+# Manifest columns of the lists table, so the Library never reads the cards table.
+# Added (and backfilled) by upgrade_lists_table on databases that predate them.
+LIST_SUMMARY_COLUMNS = {
+    "card_count": "INTEGER NOT NULL DEFAULT 0",
+    "due": "INTEGER NOT NULL DEFAULT 0",
+    "next_due": "REAL",
+    "accuracy": "REAL", # Left NULL by the upgrade: known once the list is next written or compacted
+    "last_studied": "REAL",
+    "max_card_id": "INTEGER NOT NULL DEFAULT 0",
+    "modified_at": "REAL", # Last time the list's cards were rewritten, imported into or answered
+}
+
+class SqliteStorage:
+    # One database for every user. Answers are row-level updates plus a row in
+    # the reviews table, so nothing is ever rewritten wholesale per answer.
+
+    def __init__(self, db_path=SQLITE_FILE):
+        self.db_path = db_path
+        self._local = threading.local() # sqlite3 connections are per thread
+        with self.connect() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            self.upgrade_lists_table(conn)
+            self.upgrade_cards_table(conn)
+
+    def upgrade_lists_table(self, conn):
+        present = {row[1] for row in conn.execute("PRAGMA table_info(lists)")}
+        missing = [column for column in LIST_SUMMARY_COLUMNS if column not in present]
+        if not missing:
+            return
+        for column in missing:
+            conn.execute(f"ALTER TABLE lists ADD COLUMN {column} {LIST_SUMMARY_COLUMNS[column]}")
+        now = time.time()
+        conn.execute(
+            "UPDATE lists SET "
+            "card_count = (SELECT COUNT(*) FROM cards WHERE list_id = lists.id), "
+            "due = (SELECT COUNT(*) FROM cards WHERE list_id = lists.id "
+            "       AND COALESCE(json_extract(stats, '$.due'), 0) <= ?), "
+            "next_due = (SELECT MIN(json_extract(stats, '$.due')) FROM cards WHERE list_id = lists.id "
+            "            AND json_extract(stats, '$.due') > ?), "
+            "last_studied = (SELECT MAX(reviewed_at) FROM reviews "
+            "                WHERE reviews.username = lists.username AND reviews.list_name = lists.name), "
+            "max_card_id = (SELECT COALESCE(MAX(card_id), 0) FROM cards WHERE list_id = lists.id)",
+            (now, now),
+        )
+
+    def upgrade_cards_table(self, conn):
+        # Cards written before SCHEMA_VERSION are completed once here (NULL columns of
+        # older tables, the old stats format, duplicate ids), so loading never has to
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        self.repair_card_ids(conn)
+        conn.execute(
+            "UPDATE cards SET enable_write = COALESCE(enable_write, 0), enable_choice = COALESCE(enable_choice, 0), "
+            "distractors = COALESCE(distractors, '[]') "
+            "WHERE enable_write IS NULL OR enable_choice IS NULL OR distractors IS NULL"
+        )
+        upgraded = []
+        for row_id, stats in conn.execute("SELECT rowid, stats FROM cards"):
+            current = json.dumps(upgrade_stats(loads_json(stats) if stats else None))
+            if current != stats:
+                upgraded.append((current, row_id))
+        conn.executemany("UPDATE cards SET stats = ? WHERE rowid = ?", upgraded)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def repair_card_ids(self, conn):
+        # Per user, like card_index.repair_card_ids: the first holder of an id in list
+        # order keeps it, duplicates and missing ids get new ones (older versions shipped
+        # a deck with two cards 103)
+        cards_of = {}
+        for username, row_id, card_id in conn.execute(
+            "SELECT lists.username, cards.rowid, cards.card_id FROM cards JOIN lists ON lists.id = cards.list_id "
+            "ORDER BY lists.username, lists.position, cards.position"
+        ):
+            cards_of.setdefault(username, []).append((row_id, card_id))
+        for username, cards in cards_of.items():
+            counter = conn.execute("SELECT next_card_id FROM decks WHERE username = ?", (username,)).fetchone()
+            next_id = max([card_id + 1 for _, card_id in cards if isinstance(card_id, int)] + [counter[0] if counter else 1])
+            seen = set()
+            renumbered = []
+            for row_id, card_id in cards:
+                if not isinstance(card_id, int) or card_id in seen:
+                    card_id = next_id
+                    next_id += 1
+                    renumbered.append((card_id, row_id))
+                seen.add(card_id)
+            if renumbered:
+                conn.executemany("UPDATE cards SET card_id = ? WHERE rowid = ?", renumbered)
+                self.save_next_id(conn, username, next_id)
+        conn.execute("UPDATE lists SET max_card_id = (SELECT COALESCE(MAX(card_id), 0) FROM cards WHERE list_id = lists.id)")
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3 # Only paid for by processes that use this backend
+            folder = os.path.dirname(self.db_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL") # Readers never block the writer
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def get_password(self, username):
+        row = self.connect().execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def set_password(self, username, password):
+        with self.connect() as conn:
+            conn.execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+
+    def load_users(self):
+        return dict(self.connect().execute("SELECT username, password FROM users"))
+
+    def save_users(self, users):
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT INTO users (username, password) VALUES (?, ?) "
+                "ON CONFLICT (username) DO UPDATE SET password = excluded.password",
+                users.items(),
+            )
+
+    @traced("load_deck")
+    def load_deck(self, username):
+        deck = self.read_deck(username)
+        if not deck:
+            welcome = LazyDeck.from_dict(self, default_deck(username))
+            welcome.synced = deck.synced # Stays current until something is written
+            return welcome
+        return deck
+
+    def read_deck(self, username):
+        # Only the lists table is read here; a list's cards are read when first used.
+        # Loading never writes, so exports use this too; a user without lists gets an
+        # empty deck.
+        synced = self.change_stamp(username) # Before the rows: a write in between only costs a reload
+        rows = self.connect().execute(
+            "SELECT id, name, card_count, due, next_due, accuracy, last_studied, max_card_id "
+            "FROM lists WHERE username = ? ORDER BY position",
+            (username,),
+        ).fetchall()
+        if not rows:
+            deck = LazyDeck(self, {}, None)
+            deck.synced = synced
+            return deck
+        counter = self.connect().execute("SELECT next_card_id FROM decks WHERE username = ?", (username,)).fetchone()
+        manifest = {
+            name: {
+                "list_id": list_id, "cards": cards, "due": due, "next_due": next_due, "accuracy": accuracy,
+                "last_studied": last_studied, "max_card_id": max_card_id, "version": SCHEMA_VERSION,
+            }
+            for list_id, name, cards, due, next_due, accuracy, last_studied, max_card_id in rows
+        }
+        # The stored counter is never lowered: ids of deleted cards aren't handed out again,
+        # so reviews and offline clients keep pointing at the card they meant
+        next_id = max([entry["max_card_id"] + 1 for entry in manifest.values()] + [counter[0] if counter else 1])
+        deck = LazyDeck(self, manifest, self.load_list, next_id)
+        deck.synced = synced
+        return deck
+
+    def refresh_deck(self, username, deck_data):
+        # The deck as stored now, for a session or the sync server holding one across
+        # requests: `deck_data` itself while nothing else wrote, else loaded again
+        if not isinstance(deck_data, LazyDeck) or deck_data.owner is not self:
+            return deck_data
+        if deck_data.synced is not None and self.change_stamp(username) == deck_data.synced:
+            return deck_data
+        return self.load_deck(username)
+
+    def load_list(self, name, entry):
+        rows = self.connect().execute(
+            "SELECT card_id, front, back, enable_write, enable_choice, distractors, stats "
+            "FROM cards WHERE list_id = ? ORDER BY position",
+            (entry["list_id"],),
+        )
+        return [
+            {
+                "id": card_id,
+                "front": front,
+                "back": back,
+                "enable_write": bool(enable_write),
+                "enable_choice": bool(enable_choice),
+                "distractors": loads_json(distractors),
+                "stats": loads_json(stats),
+            }
+            for card_id, front, back, enable_write, enable_choice, distractors, stats in rows
+        ]
+
+    def save_deck(self, username, deck_data, lists=None):
+        # `lists` names the lists whose cards changed (None: every loaded list), written
+        # in one transaction with the lists table: row by row for the cards changed
+        # through CardIndex, else the list's rows are rewritten. The reviews table is
+        # keyed by card id and is left alone.
+        deck = deck_data if isinstance(deck_data, LazyDeck) and deck_data.owner is self else None
+        replaced = deck is None
+        if replaced:
+            # Another backend's deck or a plain dict: replaces everything this user has
+            deck = LazyDeck.from_dict(self, dict(deck_data.items()))
+        for name in (dict(deck.loaded_items()) if lists is None else lists):
+            if name not in deck.card_changes: # Else noted card by card by CardIndex, summary and all
+                deck.touch(name)
+        with span("write_deck", user=username), self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE") # Stats are read back below: no other writer in between
+            before = self.change_stamp(username)
+            dirty, removed, edited, card_changes = deck.take_changes()
+            try:
+                if replaced:
+                    conn.execute("DELETE FROM lists WHERE username = ?", (username,))
+                for entry in removed:
+                    if "list_id" in entry:
+                        conn.execute("DELETE FROM lists WHERE id = ?", (entry["list_id"],))
+                for position, name in enumerate(deck):
+                    entry = deck.manifest[name]
+                    cards = dirty.get(name)
+                    if "list_id" not in entry:
+                        entry["list_id"] = conn.execute(
+                            "INSERT INTO lists (username, name, position) VALUES (?, ?, ?)",
+                            (username, name, position),
+                        ).lastrowid
+                        cards = deck[name] # Lists are only ever created loaded
+                        self.insert_cards(conn, entry["list_id"], 0, cards)
+                        entry["max_card_id"] = max((card["id"] for card in cards), default=0)
+                    elif name in card_changes:
+                        if self.write_card_changes(conn, entry, cards, card_changes[name]):
+                            deck.stale.add(name)
+                    elif cards is not None:
+                        self.keep_stored_stats(conn, entry["list_id"], cards)
+                        conn.execute("DELETE FROM cards WHERE list_id = ?", (entry["list_id"],))
+                        self.insert_cards(conn, entry["list_id"], 0, cards)
+                        entry["max_card_id"] = max((card["id"] for card in cards), default=0)
+                        deck.stale.add(name)
+                    if cards is not None:
+                        conn.execute("UPDATE lists SET modified_at = ? WHERE id = ?", (time.time(), entry["list_id"]))
+                    entry = deck.summary(name)
+                    conn.execute(
+                        "UPDATE lists SET position = ?, card_count = ?, due = ?, next_due = ?, accuracy = ?, "
+                        "last_studied = ?, max_card_id = ? WHERE id = ?",
+                        (
+                            position, entry["cards"], entry["due"], entry["next_due"], entry.get("accuracy"),
+                            entry.get("last_studied"), entry.get("max_card_id", 0), entry["list_id"],
+                        ),
+                    )
+                self.save_next_id(conn, username, deck.next_id)
+            except BaseException:
+                deck.restore_changes(dirty, removed, edited, card_changes)
+                raise
+            if replaced or before == deck.synced:
+                deck.synced = self.change_stamp(username)
+
+    def write_card_changes(self, conn, entry, cards, card_ids):
+        # Only the rows of the cards in `card_ids`: updated, inserted after the list's last
+        # position or deleted (positions just order a list; gaps are fine). As with
+        # keep_stored_stats, the stored stats of an edited card win; True if any differed.
+        list_id = entry["list_id"]
+        changed = {card["id"]: card for card in cards if card["id"] in card_ids}
+        conn.executemany(
+            "DELETE FROM cards WHERE list_id = ? AND card_id = ?",
+            ((list_id, card_id) for card_id in card_ids if card_id not in changed),
+        )
+        added = []
+        updated = []
+        refreshed = False
+        for card_id, card in changed.items():
+            row = conn.execute("SELECT stats FROM cards WHERE list_id = ? AND card_id = ?", (list_id, card_id)).fetchone()
+            if row is None:
+                added.append(card)
+                continue
+            stats = loads_json(row[0])
+            if stats != card["stats"]:
+                card["stats"] = stats
+                refreshed = True
+            updated.append((
+                card.get("front", ""), card.get("back", ""), int(bool(card.get("enable_write"))),
+                int(bool(card.get("enable_choice"))), json.dumps(card.get("distractors", [])), list_id, card_id,
+            ))
+        conn.executemany(
+            "UPDATE cards SET front = ?, back = ?, enable_write = ?, enable_choice = ?, distractors = ? "
+            "WHERE list_id = ? AND card_id = ?",
+            updated,
+        )
+        if added:
+            (position,) = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM cards WHERE list_id = ?", (list_id,)
+            ).fetchone()
+            self.insert_cards(conn, list_id, position, added)
+            entry["max_card_id"] = max([entry.get("max_card_id", 0)] + [card["id"] for card in added])
+        return refreshed
+
+    def keep_stored_stats(self, conn, list_id, cards):
+        # Answers are written in place as they're given, by this process and by others
+        # (the sync server), so a card's stored stats are never behind the copy in memory
+        stored = dict(conn.execute("SELECT card_id, stats FROM cards WHERE list_id = ?", (list_id,)))
+        for card in cards:
+            if card.get("id") in stored:
+                card["stats"] = loads_json(stored[card["id"]])
+
+    def save_next_id(self, conn, username, next_id):
+        conn.execute(
+            "INSERT INTO decks (username, next_card_id) VALUES (?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET next_card_id = MAX(next_card_id, excluded.next_card_id)",
+            (username, next_id),
+        )
+
+    def insert_cards(self, conn, list_id, first_position, cards):
+        conn.executemany(
+            "INSERT INTO cards (list_id, position, card_id, front, back, enable_write, "
+            "enable_choice, distractors, stats) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    list_id, pos, card.get("id"), card.get("front", ""), card.get("back", ""),
+                    int(bool(card.get("enable_write"))), int(bool(card.get("enable_choice"))),
+                    json.dumps(card.get("distractors", [])), json.dumps(card.get("stats", new_stats())),
+                )
+                for pos, card in enumerate(cards, first_position)
+            ),
+        )
+
+    def add_user(self, username, password):
+        with self.connect() as conn:
+            return conn.execute(
+                "INSERT INTO users (username, password) VALUES (?, ?) ON CONFLICT (username) DO NOTHING",
+                (username, password),
+            ).rowcount == 1
+
+    def record_review(self, username, deck_data, list_name, position, card, is_correct):
+        self.record_reviews(username, deck_data, [(list_name, position, card, is_correct, time.time())])
+
+    @traced("record_review")
+    def record_reviews(self, username, deck_data, reviews):
+        # `reviews`: (list name, position, card, is_correct, answered at), oldest first.
+        # One transaction per batch; a card answered several times is written once.
+        # Each card's stored stats are read back first, so answers another process (the
+        # sync server) recorded since this deck was loaded are kept.
+        if any("list_id" not in deck_data.manifest[review[0]] for review in reviews):
+            self.save_deck(username, deck_data) # Deck never persisted yet (e.g. the generated welcome deck)
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = self.change_stamp(username)
+            changed = {} # (list id, card id) -> (list name, card, its card_tally as its list's summary counted it)
+            for list_name, position, card, is_correct, answered_at in reviews:
+                key = (deck_data.manifest[list_name]["list_id"], card.get("id"))
+                if key not in changed:
+                    changed[key] = (list_name, card, card_tally(card))
+                    row = conn.execute("SELECT stats FROM cards WHERE list_id = ? AND card_id = ?", key).fetchone()
+                    if row is not None:
+                        card["stats"] = loads_json(row[0])
+                apply_review(card, is_correct, answered_at)
+                deck_data.note_review(list_name, answered_at)
+            conn.executemany(
+                "UPDATE cards SET stats = ? WHERE list_id = ? AND card_id = ?",
+                ((json.dumps(card["stats"]), list_id, card_id) for (list_id, card_id), (_, card, _) in changed.items()),
+            )
+            # The Library's summary of each list studied goes in with its answers
+            now = time.time()
+            for list_name, card, counted in changed.values():
+                deck_data.note_answer(list_name, counted, card, now)
+            summaries = [deck_data.summary(list_name, now) for list_name in {review[0] for review in reviews}]
+            conn.executemany(
+                "UPDATE lists SET last_studied = MAX(COALESCE(last_studied, 0), ?), due = ?, next_due = ?, "
+                "accuracy = ?, modified_at = ? WHERE id = ?",
+                (
+                    (entry["last_studied"], entry["due"], entry["next_due"], entry["accuracy"], now, entry["list_id"])
+                    for entry in summaries
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO reviews (username, list_name, card_id, ok, reviewed_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (username, list_name, card.get("id"), int(is_correct), answered_at)
+                    for list_name, _, card, is_correct, answered_at in reviews
+                ),
+            )
+            if before == deck_data.synced:
+                deck_data.synced = self.change_stamp(username) # Only our own write since: still current
+
+    def compact(self, username, deck_data):
+        # Answers are written in place with their lists' summary; due counts still move with time
+        if not isinstance(deck_data, LazyDeck):
+            return
+        with self.connect() as conn:
+            for name, _ in deck_data.loaded_items():
+                entry = deck_data.summary(name)
+                if "list_id" in entry:
+                    conn.execute(
+                        "UPDATE lists SET due = ?, next_due = ?, accuracy = ? WHERE id = ?",
+                        (entry["due"], entry["next_due"], entry["accuracy"], entry["list_id"]),
+                    )
+
+    def upgrade_deck(self, username):
+        return 0 # The whole database is upgraded when opened
+
+    def ensure_deck(self, username):
+        # A user with no rows yet is looking at the generated welcome deck; persist it
+        # before adding to it so load_deck keeps showing the same lists.
+        conn = self.connect()
+        if conn.execute("SELECT 1 FROM lists WHERE username = ? LIMIT 1", (username,)).fetchone() is None:
+            self.save_deck(username, default_deck(username))
+
+    def next_card_id(self, username):
+        self.ensure_deck(username)
+        (next_id,) = self.connect().execute(
+            "SELECT MAX((SELECT COALESCE(MAX(max_card_id), 0) + 1 FROM lists WHERE username = ?), "
+            "COALESCE((SELECT next_card_id FROM decks WHERE username = ?), 1))",
+            (username, username),
+        ).fetchone()
+        return next_id
+
+    def import_cards(self, username, list_name, batches):
+        # One transaction per batch: memory stays bounded by the batch size
+        self.ensure_deck(username)
+        conn = self.connect()
+        with conn:
+            row = conn.execute(
+                "SELECT id FROM lists WHERE username = ? AND name = ?", (username, list_name)
+            ).fetchone()
+            if row is None:
+                list_id = conn.execute(
+                    "INSERT INTO lists (username, name, position) "
+                    "SELECT ?, ?, COUNT(*) FROM lists WHERE username = ?",
+                    (username, list_name, username),
+                ).lastrowid
+            else:
+                list_id = row[0]
+        (position,) = conn.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM cards WHERE list_id = ?", (list_id,)
+        ).fetchone()
+        for batch in batches:
+            with conn:
+                self.insert_cards(conn, list_id, position, batch)
+                # New cards are due right away
+                conn.execute(
+                    "UPDATE lists SET card_count = card_count + ?, due = due + ?, "
+                    "max_card_id = MAX(max_card_id, ?), modified_at = ? WHERE id = ?",
+                    (len(batch), len(batch), max(card["id"] for card in batch), time.time(), list_id),
+                )
+                self.save_next_id(conn, username, max(card["id"] for card in batch) + 1)
+            position += len(batch)
+
+    def change_stamp(self, username):
+        # Differs whenever a list was added, removed, edited or studied since (for backups)
+        return list(self.connect().execute(
+            "SELECT COUNT(*), MAX(modified_at), MAX(last_studied), COALESCE(SUM(card_count), 0) "
+            "FROM lists WHERE username = ?",
+            (username,),
+        ).fetchone())
+
+    def iter_reviews(self, username):
+        # Every answer ever given, oldest first, streamed from the cursor
+        rows = self.connect().execute(
+            "SELECT list_name, card_id, ok, reviewed_at FROM reviews WHERE username = ? ORDER BY id",
+            (username,),
+        )
+        for list_name, card_id, ok, reviewed_at in rows:
+            yield {"list": list_name, "id": card_id, "ok": bool(ok), "ts": reviewed_at}
+
+    def list_usernames(self):
+        rows = self.connect().execute("SELECT username FROM users UNION SELECT username FROM lists")
+        return sorted(name for (name,) in rows)
+
+
+# --- Backend Selection ---
+BACKENDS = {"json": JsonStorage, "sqlite": SqliteStorage}
+_storage = None
+
+def get_storage():
+    # Module state survives Streamlit reruns, so the backend is built once per process
+    global _storage
+    if _storage is None:
+        _storage = BACKENDS[STORAGE_BACKEND]()
+    return _storage
+
+
+# --- Migration: JSON files -> SQLite ---
+def migrate_json_to_sqlite(source, target, log=print):
+    target.save_users(source.load_users())
+    for username in source.list_usernames():
+        deck = source.load_deck(username).load_all() # Replays and compacts any pending review log
+        target.save_deck(username, deck)
+        log(f"{username}: {len(deck)} lists, {sum(len(lst) for lst in deck.values())} cards")
+
+
+# --- Schema Upgrade (otherwise done lazily, one list at a time) ---
+def upgrade_all(storage, log=print):
+    total = 0
+    for username in storage.list_usernames():
+        upgraded = storage.upgrade_deck(username)
+        if upgraded:
+            log(f"{username}: {upgraded} lists upgraded to version {SCHEMA_VERSION}")
+        total += upgraded
+    return total
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m vibe_cards.storage", description="Vibe Cards storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Copy users and decks from the JSON files into SQLite")
+    migrate.add_argument("--data-folder", default=DATA_FOLDER)
+    migrate.add_argument("--db", default=SQLITE_FILE)
+    upgrade = sub.add_parser("upgrade", help=f"Bring every stored deck to schema version {SCHEMA_VERSION} now")
+    upgrade.add_argument("--backend", choices=sorted(BACKENDS), default=STORAGE_BACKEND)
+    upgrade.add_argument("--data-folder", default=DATA_FOLDER)
+    upgrade.add_argument("--db", default=SQLITE_FILE)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_json_to_sqlite(JsonStorage(args.data_folder), SqliteStorage(args.db))
+    elif args.command == "upgrade":
+        storage = SqliteStorage(args.db) if args.backend == "sqlite" else JsonStorage(args.data_folder)
+        print(f"Upgraded {upgrade_all(storage)} lists to schema version {SCHEMA_VERSION}")
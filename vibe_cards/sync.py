@@ -0,0 +1,78 @@
+import time
+
+from . import registry
+from .analytics import card_totals, get_analytics
+from .card_index import get_card_index
+from .scheduler import DueIndex
+from .storage import get_storage
+
+# --- Constants & Config ---
+DUE_LIMIT = 100 # Cards per next-due request
+
+
+# --- Answers by Card Id ---
+def record_answers(username, deck_data, answers, storage=None):
+    # `answers`: (card id, is_correct, answered at or None for now). Applied oldest
+    # first, the way the study screen applies one answer, in one storage batch. A
+    # timestamp ahead of our clock (a client's skewed clock) counts as now.
+    # Returns (answers applied, card ids not in the deck).
+    storage = storage or get_storage()
+    index = get_card_index(username, deck_data)
+    now = time.time()
+    located = [] # (answered at, list name, position, card id, is_correct)
+
+    def locate(pending):
+        missing = []
+        for card_id, is_correct, answered_at in pending:
+            try:
+                list_name, position = index.locate(card_id)
+            except KeyError:
+                missing.append((card_id, is_correct, answered_at))
+            else:
+                located.append((answered_at, list_name, position, card_id, is_correct))
+        return missing
+
+    unknown = locate(
+        (card_id, is_correct, now if answered_at is None else min(answered_at, now))
+        for card_id, is_correct, answered_at in answers
+    )
+    if unknown and len(deck_data.loaded_items()) < len(deck_data):
+        deck_data.load_all() # Cards of lists nobody opened yet: read the rest of the deck once
+        unknown = locate(unknown)
+    if not located:
+        return 0, [card_id for card_id, _, _ in unknown]
+
+    located.sort(key=lambda answer: answer[0])
+    analytics = get_analytics(username, deck_data, build=False)
+    before = {} # card id -> (list name, card, totals before its first answer in the batch)
+    reviews = []
+    for answered_at, list_name, position, card_id, is_correct in located:
+        card = deck_data[list_name][position]
+        if card_id not in before:
+            before[card_id] = (list_name, card, card_totals(card.get("stats", {})))
+        reviews.append((list_name, position, card, is_correct, answered_at))
+    storage.record_reviews(username, deck_data, reviews)
+    if analytics is not None:
+        for list_name, card, totals in before.values():
+            analytics.record(list_name, card, totals)
+    for list_name, card, _ in before.values():
+        registry.notify(deck_data, "card_answered", list_name, card)
+    return len(reviews), [card_id for card_id, _, _ in unknown]
+
+
+# --- Next Due Cards ---
+def due_cards(deck_data, limit=DUE_LIMIT, within=0, list_names=None, now=None):
+    # Up to `limit` (list name, card) due within `within` seconds, soonest first, from
+    # the deck's DueIndex. Lists not loaded yet whose manifest says nothing comes due by
+    # then are skipped without being read.
+    now = time.time() if now is None else now
+    horizon = now + within
+    names = []
+    for name in (list(deck_data) if list_names is None else [n for n in list_names if n in deck_data]):
+        if not deck_data.is_loaded(name):
+            summary = deck_data.summary(name, now)
+            next_due = summary.get("next_due")
+            if summary.get("due", 1) <= 0 and (next_due is None or next_due > horizon):
+                continue
+        names.append(name)
+    return registry.get_index(deck_data, "due", DueIndex).due(names, horizon, limit)
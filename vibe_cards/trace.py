@@ -0,0 +1,191 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# --- Constants & Config ---
+ENABLED = os.environ.get("VIBE_CARDS_TRACE", "") not in ("", "0") # Opt-in: spans cost nothing when off
+TRACE_FILE = os.environ.get("VIBE_CARDS_TRACE_FILE") # Every finished rerun is also appended here as JSONL
+KEEP_RERUNS = 20 # Reruns kept per session for the debug panel
+KEEP_BACKGROUND = 200 # Spans kept from threads outside any rerun (e.g. write-behind flushes)
+
+
+# --- Spans ---
+# A rerun is one execution of the Streamlit script. Spans opened on its thread while it
+# is active are collected into it; spans from other threads go to `background`.
+_local = threading.local()
+_rerun_ids = itertools.count(1)
+_file_lock = threading.Lock()
+background = deque(maxlen=KEEP_BACKGROUND)
+
+class Rerun:
+    def __init__(self, **attrs):
+        self.id = next(_rerun_ids)
+        self.attrs = attrs
+        self.ts = time.time()
+        self.start = time.perf_counter()
+        self.duration = None # Seconds, set by end_rerun
+        self.interrupted = False # Ended by st.rerun()/st.stop() before reaching the end of the script
+        self.spans = [] # {"name", "ts", "dur", "depth", "attrs"}, in the order they closed
+        self.phase = None
+
+    def breakdown(self):
+        # name -> [count, total seconds], slowest first
+        totals = {}
+        for span in self.spans:
+            entry = totals.setdefault(span["name"], [0, 0.0])
+            entry[0] += 1
+            entry[1] += span["dur"]
+        return dict(sorted(totals.items(), key=lambda item: -item[1][1]))
+
+class Span:
+    __slots__ = ("name", "attrs", "rerun", "depth", "ts", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        # Attributes only known once the work is done, e.g. how many cards were loaded
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.rerun = getattr(_local, "rerun", None)
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.ts = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record = {
+            "name": self.name, "ts": self.ts, "dur": time.perf_counter() - self.start,
+            "depth": self.depth, "attrs": self.attrs,
+        }
+        _local.depth = self.depth
+        if self.rerun is not None:
+            self.rerun.spans.append(record)
+        else:
+            record["thread"] = threading.current_thread().name
+            background.append(record)
+            if TRACE_FILE:
+                _append_lines([record])
+
+class _NoSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+def span(name, **attrs):
+    # with span("load_deck", user=username) as s: ...; s.set(cards=n)
+    return Span(name, attrs) if ENABLED else _NO_SPAN
+
+def traced(name):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Reruns ---
+def begin_rerun(history, **attrs):
+    # `history` is the session's deque of recent reruns. The previous one is still open
+    # if st.rerun()/st.stop() cut it short; it is closed at its last recorded span.
+    if history and history[-1].duration is None:
+        previous = history[-1]
+        last = max((span["ts"] + span["dur"] for span in previous.spans), default=previous.ts)
+        if previous.phase is not None:
+            last = max(last, previous.phase[1])
+        _close_phase(previous, previous.start + (last - previous.ts))
+        _finish(previous, last - previous.ts, interrupted=True)
+    rerun = Rerun(**attrs)
+    _local.rerun = rerun
+    _local.depth = 0
+    history.append(rerun)
+    return rerun
+
+def phase(rerun, name):
+    # Top-level section of the script (login, dashboard, editor...): ends the previous one
+    now = time.perf_counter()
+    _close_phase(rerun, now)
+    rerun.phase = (name, time.time(), now)
+    _local.depth = 1
+
+def end_rerun(rerun):
+    now = time.perf_counter()
+    _close_phase(rerun, now)
+    _finish(rerun, now - rerun.start)
+
+def _close_phase(rerun, now):
+    if rerun.phase is None:
+        return
+    name, ts, start = rerun.phase
+    rerun.spans.append({"name": name, "ts": ts, "dur": max(0.0, now - start), "depth": 0, "attrs": {}})
+    rerun.phase = None
+
+def _finish(rerun, duration, interrupted=False):
+    rerun.duration = duration
+    rerun.interrupted = interrupted
+    if getattr(_local, "rerun", None) is rerun:
+        _local.rerun = None
+        _local.depth = 0
+    if TRACE_FILE:
+        _append_lines(jsonl_records([rerun]))
+
+
+# --- Export ---
+def jsonl_records(reruns):
+    # One record per rerun followed by one per span, each tagged with the rerun id
+    for rerun in reruns:
+        yield {
+            "rerun": rerun.id, "name": "rerun", "ts": rerun.ts, "dur": rerun.duration,
+            "interrupted": rerun.interrupted, "attrs": rerun.attrs,
+        }
+        for span in rerun.spans:
+            yield dict(span, rerun=rerun.id)
+
+def to_jsonl(reruns):
+    return "".join(json.dumps(record, default=str) + "\n" for record in jsonl_records(reruns))
+
+def to_chrome_trace(reruns, background_spans=()):
+    # Trace Event Format: load the file in chrome://tracing or https://ui.perfetto.dev
+    events = []
+    pid = os.getpid()
+    for rerun in reruns:
+        if rerun.duration is None:
+            continue
+        events.append({
+            "name": f"rerun {rerun.id}", "ph": "X", "pid": pid, "tid": "reruns",
+            "ts": rerun.ts * 1e6, "dur": rerun.duration * 1e6, "args": rerun.attrs,
+        })
+        for span in rerun.spans:
+            events.append({
+                "name": span["name"], "ph": "X", "pid": pid, "tid": "reruns",
+                "ts": span["ts"] * 1e6, "dur": span["dur"] * 1e6, "args": span["attrs"],
+            })
+    for span in background_spans:
+        events.append({
+            "name": span["name"], "ph": "X", "pid": pid, "tid": span.get("thread", "background"),
+            "ts": span["ts"] * 1e6, "dur": span["dur"] * 1e6, "args": span["attrs"],
+        })
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+
+def _append_lines(records):
+    lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+    with _file_lock, open(TRACE_FILE, "a") as f:
+        f.write(lines)